@@ -2,7 +2,6 @@
 This module contains the callbacks of the application.
 """
 
-import datetime
 import os
 
 from dash import Input, Output, State, callback, clientside_callback
@@ -13,7 +12,7 @@ from pages.activity.navbar import ActivityNavbar
 from pages.calendar.navbar import CalendarNavbar
 from pages.home.navbar import HomeNavbar
 from pages.map.navbar import MapNavbar
-from strava.client import CLIENT
+from storage.store import ATHLETE_STORE, STORE
 
 BASE_PATHNAME = os.getenv("BASE_PATHNAME")
 
@@ -38,42 +37,34 @@ def register_callbacks():
 
     @callback(
         Output("athlete-store", "data"),
-        Input("app-start-interval", "n_intervals"),
+        Input("dataset-interval", "n_intervals"),
         State("athlete-store", "data"),
-        prevent_initial_call=True,
     )
     def load_athlete(_, data):
         """
-        Update the athlete table with data from Strava client.
+        Update the athlete table with the latest local athlete data.
         """
-        if data is not None and data != {}:
+        athlete = ATHLETE_STORE.data
+        if athlete == {} or athlete == data:
             raise PreventUpdate
 
-        print("Loading athlete data...")
-        athlete = CLIENT.get_athlete()
-        return athlete.model_dump() | athlete.stats.model_dump()
+        return athlete
 
     @callback(
         Output("activities-store", "data"),
-        Input("app-start-interval", "n_intervals"),
+        Input("dataset-interval", "n_intervals"),
         State("activities-store", "data"),
-        prevent_initial_call=True,
     )
-    def load_activities(_, data):
+    def load_activities(_, version):
         """
-        Update the activities table with data from Strava client.
+        Update the activities dataset version with the latest local
+        dataset.
         """
-        if data is not None and data != {}:
+        dataset = STORE.snapshot()
+        if dataset.df.is_empty() or dataset.version == version:
             raise PreventUpdate
 
-        print("Loading activities data...")
-        start_date = datetime.datetime.now() - datetime.timedelta(weeks=10)
-        activities = CLIENT.get_activities(after=start_date)
-        data = []
-        for activity in activities:
-            data.append(activity.model_dump())
-        data.reverse()
-        return data
+        return dataset.version
 
     @callback(
         Output("navbar", "children"),
@@ -78,10 +78,10 @@ def Layout():
                 # Hidden components
                 dcc.Location(id="url"),
                 dcc.Store(id="athlete-store", data={}),
-                dcc.Store(id="activities-store", data={}),
+                dcc.Store(id="activities-store"),  # Activities dataset version
                 dcc.Interval(
-                    id="app-start-interval", interval=10, max_intervals=1
-                ),  # Trigger once on app start
+                    id="dataset-interval", interval=10 * 1000
+                ),  # Poll the latest dataset version
                 # Visible components
                 Header(),
                 Navbar(),
@@ -0,0 +1,57 @@
+"""
+This module contains the routes of the application server (non Dash
+resources).
+"""
+
+import os
+
+from flask import Flask, Response, abort
+
+from storage.store import STORE
+from storage.thumbnails import THUMBNAIL_CACHE, thumbnail_hash
+from storage.tiles import MAX_TILE_ZOOM, TILE_CACHE
+
+BASE_PATHNAME = os.getenv("BASE_PATHNAME")
+
+
+def register_routes(server: Flask):
+    """
+    Register routes of the application server.
+
+    Args:
+        server (Flask): Application server.
+    """
+
+    @server.route(f"{BASE_PATHNAME}tiles/heatmap/<int:z>/<int:x>/<int:y>.png")
+    def heatmap_tile(z, x, y):
+        """
+        Serve a heatmap tile.
+        """
+        if not 0 <= z <= MAX_TILE_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+            abort(404)
+
+        return Response(
+            TILE_CACHE.get(z, x, y),
+            mimetype="image/png",
+            headers={"Cache-Control": "public, max-age=86400"},
+        )
+
+    @server.route(f"{BASE_PATHNAME}thumbnails/<int:activity_id>-<int:hash_>.svg")
+    def activity_thumbnail(activity_id, hash_):
+        """
+        Serve the thumbnail of an activity.
+        """
+        activity = STORE.snapshot().activity(activity_id)
+        if activity is None:
+            abort(404)
+
+        return Response(
+            THUMBNAIL_CACHE.get(activity),
+            mimetype="image/svg+xml",
+            headers={
+                # URLs change with the route and sport type
+                "Cache-Control": "public, max-age=31536000, immutable"
+                if thumbnail_hash(activity) == hash_
+                else "no-cache"
+            },
+        )
@@ -13,6 +13,8 @@ load_dotenv(override=True)  # Load environment variables from .env file
 
 from app.callbacks import register_callbacks  # noqa: E402
 from app.layout import Layout  # noqa: E402
+from app.routes import register_routes  # noqa: E402
+from storage.worker import SyncWorker  # noqa: E402
 
 #######################################################################
 ## Environment Setup ##################################################
@@ -33,6 +35,7 @@ app = dash.Dash(
 )
 app.layout = Layout  # Set the layout of the application
 register_callbacks()  # Register application callbacks
+register_routes(app.server)  # Register server routes (e.g.: map tiles)
 
 #######################################################################
 ## Launch App #########################################################
@@ -40,6 +43,16 @@ register_callbacks()  # Register application callbacks
 
 if __name__ == "__main__":
     print("==== RUN APP ====")
+    # The debug reloader runs this file in a parent and a child process,
+    # only the child (WERKZEUG_RUN_MAIN set) serves requests
+    debug = len(sys.argv) == 1 or sys.argv[1] not in [
+        "nginx",
+        "waitress",
+        "local",
+        "profile",
+    ]
+    if not debug or os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        SyncWorker().start()  # Synchronise data with Strava in background
     if len(sys.argv) > 1:
         if sys.argv[1] == "nginx":
             from waitress import serve
@@ -2,13 +2,15 @@
 This module contains the callbacks of the Activities page.
 """
 
+import dash
 import dash_mantine_components as dmc
-import polars as pl
-from dash import Input, Output, callback, dcc
+from dash import Input, Output, Patch, State, callback, clientside_callback
 from dash.exceptions import PreventUpdate
 
 from constants.colors import SPORT_TYPE_COLORS
-from utils.maps import create_map
+from storage.store import STORE
+from storage.thumbnails import thumbnail_hash
+from templates.components.listeners import NEAR_BOTTOM
 
 
 def register_callbacks():
@@ -34,66 +36,126 @@ def register_callbacks():
 
     #     return data
 
+    def create_card(row):
+        return dmc.Card(
+            children=[
+                dmc.CardSection(
+                    dmc.Image(
+                        src=dash.get_relative_path(
+                            f"/thumbnails/{row['id']}-{thumbnail_hash(row)}.svg"
+                        ),
+                        h=200,
+                        fit="contain",
+                        alt=row["name"],
+                    )
+                ),
+                dmc.Space(h=60),
+                dmc.Stack(
+                    [
+                        dmc.Badge(
+                            row["sport_type"],
+                            color=SPORT_TYPE_COLORS[row["sport_type"]],
+                        ),
+                        dmc.Title(row["name"], order=3),
+                        dmc.Anchor(
+                            dmc.Button(
+                                "Go to report",
+                                fullWidth=True,
+                                radius="md",
+                            ),
+                            href=f"/datamountain/activity/{row['id']}",
+                            mt="auto",  # Push button to the bottom of the card
+                        ),
+                    ],
+                    flex=1,
+                ),
+            ],
+            withBorder=True,
+            shadow="sm",
+            radius="md",
+            style={
+                "display": "flex",
+                "flexDirection": "column",
+                "height": "100%",
+            },
+        )
+
+    def create_cards(df, offset, page_size):
+        # Newest activities first
+        start = max(df.height - offset - page_size, 0)
+        rows = df.slice(start, max(df.height - offset - start, 0))
+        return [create_card(row) for row in rows.reverse().iter_rows(named=True)]
+
     @callback(
-        Output({"page": "activities", "component": "activities-list"}, "children"),
+        [
+            Output({"page": "activities", "component": "activities-list"}, "children"),
+            Output({"page": "activities", "component": "count-store"}, "data"),
+        ],
         [
             Input("url", "pathname"),
-            Input({"page": "activities", "component": "map-layer-select"}, "value"),
+            Input({"page": "activities", "component": "page-size-select"}, "value"),
             Input("activities-store", "data"),
         ],
     )
-    def update_activities_list(pathname, map_layer, data):
+    def update_activities_list(pathname, page_size, version):
         """
-        Update the activities list.
+        Update the activities list with the first page of activities.
         """
         if pathname is None or "/activities" not in pathname:
             raise PreventUpdate
-        if data is None or data == {}:
+        if page_size is None:
+            raise PreventUpdate
+        if version is None:
             raise PreventUpdate
 
-        activities = []
-        for row in pl.DataFrame(data).iter_rows():
-            activities.append(
-                dmc.Card(
-                    children=[
-                        dmc.CardSection(
-                            dcc.Graph(
-                                figure=create_map(
-                                    polyline_str=row[22]["summary_polyline"],
-                                    name=row[26],
-                                    color=SPORT_TYPE_COLORS.get(row[29], "#FFA800"),
-                                    map_layer=map_layer,
-                                ).update_traces(hoverinfo="skip", hovertemplate=None),
-                                config={"scrollZoom": False},  # "displayModeBar": False
-                            )
-                        ),
-                        dmc.Space(h=60),
-                        dmc.Stack(
-                            [
-                                dmc.Badge(row[29], color=SPORT_TYPE_COLORS[row[29]]),
-                                dmc.Title(row[26], order=3),
-                                dmc.Anchor(
-                                    dmc.Button(
-                                        "Go to report",
-                                        fullWidth=True,
-                                        radius="md",
-                                    ),
-                                    href=f"/datamountain/activity/{row[0]}",
-                                    mt="auto",  # Push button to the bottom of the card
-                                ),
-                            ],
-                            flex=1,
-                        ),
-                    ],
-                    withBorder=True,
-                    shadow="sm",
-                    radius="md",
-                    style={
-                        "display": "flex",
-                        "flexDirection": "column",
-                        "height": "100%",
-                    },
-                )
-            )
-
-        return activities
+        df = STORE.get(version).df
+        page_size = int(page_size)
+
+        return create_cards(df, 0, page_size), min(page_size, df.height)
+
+    clientside_callback(
+        NEAR_BOTTOM,
+        Output({"page": "activities", "component": "scroll-store"}, "data"),
+        Input({"page": "activities", "component": "scroll-listener"}, "event"),
+    )  # Request more activities when the list is scrolled near its bottom
+
+    @callback(
+        [
+            Output(
+                {"page": "activities", "component": "activities-list"},
+                "children",
+                allow_duplicate=True,
+            ),
+            Output(
+                {"page": "activities", "component": "count-store"},
+                "data",
+                allow_duplicate=True,
+            ),
+        ],
+        Input({"page": "activities", "component": "scroll-store"}, "data"),
+        [
+            State({"page": "activities", "component": "page-size-select"}, "value"),
+            State("activities-store", "data"),
+            State({"page": "activities", "component": "count-store"}, "data"),
+        ],
+        prevent_initial_call=True,
+    )
+    def load_more_activities(_, page_size, version, n_activities):
+        """
+        Append the next page of activities to the list.
+        """
+        if page_size is None:
+            raise PreventUpdate
+        if version is None or not n_activities:
+            raise PreventUpdate
+
+        df = STORE.get(version).df
+        if n_activities >= df.height:
+            raise PreventUpdate
+        page_size = int(page_size)
+
+        # Only send the new cards
+        children = Patch()
+        children.extend(create_cards(df, n_activities, page_size))
+
+        return children, min(n_activities + page_size, df.height)
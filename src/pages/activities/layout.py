@@ -6,6 +6,9 @@ import dash
 
 # import dash_ag_grid as dag
 import dash_mantine_components as dmc
+from dash import dcc
+
+from templates.components.listeners import ScrollListener
 
 from .callbacks import register_callbacks
 
@@ -32,12 +35,24 @@ layout = dmc.Container(
             #         {"field": "visibility"},
             #     ],
             # ),
-            dmc.SimpleGrid(
-                id={"page": "activities", "component": "activities-list"},
-                cols=4,
-                spacing="md",
-                verticalSpacing="md",
+            ScrollListener(
+                {"page": "activities", "component": "scroll-listener"},
+                dmc.ScrollArea(
+                    dmc.SimpleGrid(
+                        id={"page": "activities", "component": "activities-list"},
+                        cols=4,
+                        spacing="md",
+                        verticalSpacing="md",
+                    ),
+                    h="85vh",
+                ),
             ),
+            dcc.Store(
+                id={"page": "activities", "component": "count-store"}
+            ),  # Number of activities rendered
+            dcc.Store(
+                id={"page": "activities", "component": "scroll-store"}
+            ),  # Time of the latest request for more activities
         ],
     ),
     fluid=True,
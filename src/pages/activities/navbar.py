@@ -6,8 +6,6 @@ This module contains the layout of the Activities page navbar.
 
 import dash_mantine_components as dmc
 
-from templates.components.selects import PlotlyMapLayerSelect
-
 
 def ActivitiesNavbar():
     """
@@ -16,8 +14,12 @@ def ActivitiesNavbar():
     return dmc.Stack(
         [
             dmc.Title("Activities", order=1),
-            PlotlyMapLayerSelect(
-                {"page": "activities", "component": "map-layer-select"}
+            dmc.Select(
+                id={"page": "activities", "component": "page-size-select"},
+                label="Page Size",
+                data=["12", "24", "48", "96"],
+                value="24",
+                allowDeselect=False,
             ),
         ]
     )
@@ -2,10 +2,11 @@
 This module contains the callbacks of the Activities page.
 """
 
-import polars as pl
 from dash import Input, Output, State, callback
 from dash.exceptions import PreventUpdate
 
+from storage.store import STORE
+
 
 def register_callbacks():
     """
@@ -23,20 +24,17 @@ def register_callbacks():
         Input("url", "pathname"),
         State("activities-store", "data"),
     )
-    def update_activity_title(pathname, data):
+    def update_activity_title(pathname, version):
         """
         Update the Activity page title.
         """
         if pathname is None or "/activity" not in pathname:
             raise PreventUpdate
-        if data is None or data == {}:
+        if version is None:
             raise PreventUpdate
 
-        activity_data = pl.DataFrame(data).filter(
-            pl.col("id") == int(pathname.split("/")[-1])
-        )
+        activity_data = STORE.get(version).activity(int(pathname.split("/")[-1]))
 
-        if activity_data.is_empty():
+        if activity_data is None:
             return f"Activity with ID {pathname.split('/')[-1]} does not exist..."
-        activity_data = activity_data.row(0)
-        return f"{activity_data[26]}"
+        return f"{activity_data['name']}"
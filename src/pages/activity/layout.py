@@ -7,6 +7,7 @@ import dash_mantine_components as dmc
 
 from .callbacks import register_callbacks
 from .tabs.graphs.layout import GraphsLayout
+from .tabs.loading import TABS_ID
 from .tabs.overview.layout import OverviewLayout
 from .tabs.statistics.layout import StatisticsLayout
 
@@ -45,6 +46,7 @@ def layout(activity_id):  # pylint: disable=unused-argument
                     dmc.TabsPanel(StatisticsLayout(), value="statistics"),
                     dmc.TabsPanel(GraphsLayout(), value="graphs"),
                 ],
+                id=TABS_ID,
                 value="overview",
                 variant="outline",
             ),
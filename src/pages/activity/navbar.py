@@ -69,6 +69,27 @@ def ActivityNavbar():
                                 transitionDuration=100,
                                 transitionTimingFunction="linear",
                             ),
+                            dmc.MultiSelect(
+                                id={
+                                    "page": "activity",
+                                    "tab": "graphs",
+                                    "component": "streams-select",
+                                },
+                                label="Streams",
+                                placeholder="Select streams",
+                                data=[
+                                    {
+                                        "value": "velocity_smooth",
+                                        "label": "Speed / Pace",
+                                    },
+                                    {"value": "altitude", "label": "Elevation"},
+                                    {"value": "heartrate", "label": "Heart Rate"},
+                                    {"value": "cadence", "label": "Cadence"},
+                                    {"value": "watts", "label": "Power"},
+                                    {"value": "grade_smooth", "label": "Grade"},
+                                ],
+                                value=["velocity_smooth", "altitude", "heartrate"],
+                            ),
                             FoliumMapLayerSelect(
                                 {
                                     "page": "activity",
@@ -2,14 +2,39 @@
 This module contains the callbacks of the Graphs tab of the Activity page.
 """
 
+import os
+from functools import lru_cache
+
 import folium
 import numpy as np
-import plotly.graph_objects as go
-from dash import Input, Output, State, callback
+import polars as pl
+from dash import Input, Output, State, callback, clientside_callback, ctx
 from dash.exceptions import PreventUpdate
 
 from constants.colors import COLORMAPS
-from strava.client import CLIENT
+from pages.activity.tabs.loading import TABS_ID, check_loaded, loaded_store_id
+from storage.streams import STREAM_CACHE
+from utils.downsampling import lttb
+
+# Number of points of the stream graphs, shared between the displayed
+# streams (full resolution is sent when fewer points are visible)
+GRAPH_POINTS = int(os.getenv("GRAPH_POINTS", "2000"))
+
+# Streams of the stream graphs
+GRAPH_STREAMS = [
+    "velocity_smooth",
+    "altitude",
+    "heartrate",
+    "cadence",
+    "watts",
+    "grade_smooth",
+]
+
+# Number of rendered maps kept in memory
+MAP_CACHE_SIZE = 32
+
+# Maximum number of points of the map trace
+MAX_MAP_POINTS = 2000
 
 
 def register_callbacks():
@@ -17,84 +42,80 @@ def register_callbacks():
     Register callbacks of the Graphs tab of the Activity page.
     """
 
-    def safe_div(num, den):
-        try:
-            return num / den
-        except ZeroDivisionError:
-            return 0.0
-
-    def create_speed_graph(activity_streams, time, pace):
-        fig = go.Figure()
+    def downsample(activity_streams, time=True, x_range=None):
+        """
+        Downsample the streams of an activity to a columnar buffer sharing
+        the same time and distance arrays. Each stream keeps its share of
+        GRAPH_POINTS points selected with LTTB on the time axis (the union
+        is kept so that the peaks of every stream are displayed).
+        """
+        columns = [
+            column
+            for column in GRAPH_STREAMS
+            if activity_streams[column].null_count() < activity_streams.height
+        ]
+        start, stop = 0, activity_streams.height
+        if x_range is not None:
+            # Keep one point on each side so that lines reach the edges
+            x = activity_streams["time" if time else "distance"].to_numpy()
+            start, stop = np.searchsorted(x, x_range)
+            start, stop = max(start - 1, 0), stop + 1
+        activity_streams = activity_streams[start:stop]
 
-        # Create hovertemplate and y-stream
-        hovertemplate = "Time: %{x}<br>" if time else "Distance: %{x} m<br>"
-        if pace:
-            y = [
-                safe_div(60, v * 3.6) for v in activity_streams["velocity_smooth"].data
-            ]
-            hovertemplate += "<br>Pace: %{y:.2f} min/km"
-        else:
-            y = [v * 3.6 for v in activity_streams["velocity_smooth"].data]
-            hovertemplate += "<br>Speed: %{y:.2f} km/h"
-        fig.add_trace(
-            go.Scatter(
-                x=activity_streams["time"].data
-                if time
-                else activity_streams["distance"].data,
-                y=y,
-                hovertemplate=hovertemplate,
-                line={"color": "#0000FF"},
+        t = activity_streams["time"].to_numpy()
+        n_out = GRAPH_POINTS // max(len(columns), 1)
+        indices = np.unique(
+            np.concatenate(
+                [np.arange(0)]
+                + [lttb(t, activity_streams[c].to_numpy(), n_out) for c in columns]
             )
         )
-        return fig
-
-    def create_ele_graph(activity_streams, time):
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(
-                x=activity_streams["time"].data
-                if time
-                else activity_streams["distance"].data,
-                y=activity_streams["altitude"].data,
-                hovertemplate="Time: %{x}<br>Elevation: %{y:.2f} m"
-                if time
-                else "Distance: %{x} m<br>Elevation: %{y:.2f} m",  # TODO convert to km
-                line={"color": "#00FF00"},
+        return (
+            activity_streams[indices]
+            .select(
+                "time",
+                pl.col("distance").cast(pl.Float64).round(1),
+                *[pl.col(c).cast(pl.Float64).round(3) for c in columns],
             )
+            .to_dict(as_series=False)
         )
-        return fig
-
-    def create_heartrate_graph(activity_streams, time):
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(
-                x=activity_streams["time"].data
-                if time
-                else activity_streams["distance"].data,
-                y=activity_streams["heartrate"].data,
-                hovertemplate="Time: %{x}<br>Heartrate: %{y:.2f} bpm"
-                if time
-                else "Distance: %{x} m<br>Heartrate: %{y:.2f} bpm",
-                line={"color": "#FF0000"},
-            )
+
+    @lru_cache(maxsize=MAP_CACHE_SIZE)
+    def create_map(activity_id, color):
+        activity_streams = STREAM_CACHE.get(activity_id).drop_nulls(
+            ["lat", "lng", color]
         )
-        return fig
+        if activity_streams.is_empty():
+            return ""
+
+        # Keep about one point every total distance / MAX_MAP_POINTS so that
+        # long activities and pauses do not inflate the map (activities
+        # without distance stream are sampled by index)
+        step = (activity_streams["distance"].max() or 0) / MAX_MAP_POINTS
+        if step:
+            activity_streams = activity_streams.filter(
+                (pl.col("distance") // step).is_first_distinct()
+                | (pl.int_range(pl.len()) == pl.len() - 1)
+            )
+        else:
+            activity_streams = activity_streams.gather_every(
+                -(-activity_streams.height // MAX_MAP_POINTS)
+            )
 
-    def create_map(activity_streams, color):
-        lats = [point[0] for point in activity_streams["latlng"].data]
-        lons = [point[1] for point in activity_streams["latlng"].data]
-        center_lat = np.mean(lats)
-        center_lon = np.mean(lons)
+        lats = activity_streams["lat"].to_list()
+        lons = activity_streams["lng"].to_list()
+        center_lat = activity_streams["lat"].mean()
+        center_lon = activity_streams["lng"].mean()
 
         m = folium.Map([center_lat, center_lon], zoom_start=15)
 
         colormap = COLORMAPS[color].scale(
-            min(activity_streams[color].data), max(activity_streams[color].data)
+            activity_streams[color].min(), activity_streams[color].max()
         )
 
         folium.ColorLine(
             positions=list(zip(lats, lons)),
-            colors=activity_streams[color].data,
+            colors=activity_streams[color].to_list(),
             colormap=colormap,
             weight=5,
         ).add_to(m)
@@ -106,24 +127,159 @@ def register_callbacks():
     @callback(
         [
             Output(
-                {"page": "activity", "tab": "graphs", "component": "speed-graph"},
-                "figure",
+                {"page": "activity", "tab": "graphs", "component": "streams-store"},
+                "data",
             ),
-            Output(
-                {"page": "activity", "tab": "graphs", "component": "ele-graph"},
-                "figure",
-            ),
-            Output(
-                {"page": "activity", "tab": "graphs", "component": "heartrate-graph"},
-                "figure",
+            Output(loaded_store_id("graphs", "streams"), "data"),
+        ],
+        [
+            Input("url", "pathname"),
+            Input("activities-store", "data"),
+            Input(TABS_ID, "value"),
+        ],
+        State(loaded_store_id("graphs", "streams"), "data"),
+    )
+    def load_streams(pathname, version, active_tab, loaded):
+        """
+        Load the downsampled streams of the graphs (when the tab is first
+        shown).
+        """
+        if pathname is None or "/activity" not in pathname:
+            raise PreventUpdate
+        if version is None:
+            raise PreventUpdate
+
+        loaded = check_loaded("graphs", active_tab, loaded, pathname, version)
+
+        activity_id = int(pathname.split("/")[-1])
+
+        # Points are selected on the time axis and reused on the distance
+        # axis (both are monotonic) so that toggles are handled clientside
+        streams = downsample(STREAM_CACHE.get(activity_id))
+        return {"id": activity_id, "range": None, **streams}, loaded
+
+    @callback(
+        Output(
+            {"page": "activity", "tab": "graphs", "component": "streams-store"},
+            "data",
+            allow_duplicate=True,
+        ),
+        [
+            Input(
+                {"page": "activity", "tab": "graphs", "component": "streams-graph"},
+                "relayoutData",
             ),
-            Output(
-                {"page": "activity", "tab": "graphs", "component": "map"},
-                "srcDoc",
+            Input(
+                {
+                    "page": "activity",
+                    "tab": "graphs",
+                    "component": "time-dist-control",
+                },
+                "value",
             ),
         ],
+        State(
+            {"page": "activity", "tab": "graphs", "component": "streams-store"},
+            "data",
+        ),
+        prevent_initial_call=True,
+    )
+    def refine_streams(relayout_data, time_dist, streams):
+        """
+        Downsample the streams again for the visible range after a zoom.
+        """
+        if streams is None:
+            raise PreventUpdate
+
+        x_range = None
+        if ctx.triggered_id["component"] == "time-dist-control":
+            # Ranges are not valid on the other axis
+            if streams["range"] is None:
+                raise PreventUpdate
+        elif relayout_data is None:
+            raise PreventUpdate
+        elif "xaxis.range[0]" in relayout_data:
+            x_range = [
+                relayout_data["xaxis.range[0]"],
+                relayout_data["xaxis.range[1]"],
+            ]
+        elif "xaxis.range" in relayout_data:
+            x_range = relayout_data["xaxis.range"]
+        elif not relayout_data.get("xaxis.autorange") or streams["range"] is None:
+            raise PreventUpdate
+
+        activity_streams = STREAM_CACHE.get(streams["id"])
+        return {
+            "id": streams["id"],
+            "range": x_range,
+            **downsample(activity_streams, time_dist == "time", x_range),
+        }
+
+    clientside_callback(
+        """
+        (streams, timeDist, paceSpeed, columns) => {
+            if (!streams) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const pace = paceSpeed === "pace";
+            const graphs = {
+                velocity_smooth: pace
+                    ? ["Pace", "min/km", "#0000FF", (v) => (v > 0 ? 60 / (v * 3.6) : 0.0)]
+                    : ["Speed", "km/h", "#0000FF", (v) => (v === null ? null : v * 3.6)],
+                altitude: ["Elevation", "m", "#00FF00", (v) => v],
+                heartrate: ["Heartrate", "bpm", "#FF0000", (v) => v],
+                cadence: ["Cadence", "rpm", "#FF8C00", (v) => v],
+                watts: ["Power", "W", "#800080", (v) => v],
+                grade_smooth: ["Grade", "%", "#808080", (v) => v],
+            };
+            // One row per displayed stream, all sharing the same x axis
+            const shown = (columns || []).filter((column) => column in streams);
+            const x = timeDist === "time" ? streams.time : streams.distance;
+            const axis = (i) => (i > 0 ? `y${i + 1}` : "y");
+            const gap = 0.03;
+            const height = (1 - gap * (shown.length - 1)) / shown.length;
+            const layout = {
+                height: 100 + 200 * shown.length,
+                hovermode: "x unified",
+                showlegend: false,
+                margin: { t: 20 },
+                xaxis: {
+                    anchor: axis(Math.max(shown.length - 1, 0)),
+                    title: { text: timeDist === "time" ? "Time (s)" : "Distance (m)" },
+                },
+                // Keep the zoom when the streams are downsampled again
+                uirevision: `${streams.id}-${timeDist}`,
+            };
+            const data = shown.map((column, i) => {
+                const [label, unit, color, transform] = graphs[column];
+                const top = 1 - i * (height + gap);
+                layout[axis(i).replace("y", "yaxis")] = {
+                    domain: [Math.max(top - height, 0), top],
+                    title: { text: `${label} (${unit})` },
+                    anchor: "x",
+                };
+                return {
+                    type: "scattergl",
+                    x: x,
+                    y: streams[column].map(transform),
+                    yaxis: axis(i),
+                    name: label,
+                    hovertemplate: `%{y:.2f} ${unit}`,
+                    line: { color: color },
+                };
+            });
+            return { data: data, layout: layout };
+        }
+        """,
+        Output(
+            {"page": "activity", "tab": "graphs", "component": "streams-graph"},
+            "figure",
+        ),
         [
-            Input("url", "pathname"),
+            Input(
+                {"page": "activity", "tab": "graphs", "component": "streams-store"},
+                "data",
+            ),
             Input(
                 {
                     "page": "activity",
@@ -140,6 +296,27 @@ def register_callbacks():
                 },
                 "value",
             ),
+            Input(
+                {
+                    "page": "activity",
+                    "tab": "graphs",
+                    "component": "streams-select",
+                },
+                "value",
+            ),
+        ],
+    )  # Build the graph from the streams (toggles do not reach the server)
+
+    @callback(
+        [
+            Output(
+                {"page": "activity", "tab": "graphs", "component": "map"},
+                "srcDoc",
+            ),
+            Output(loaded_store_id("graphs", "map"), "data"),
+        ],
+        [
+            Input("url", "pathname"),
             Input(
                 {
                     "page": "activity",
@@ -147,40 +324,23 @@ def register_callbacks():
                 },
                 "value",
             ),
+            Input(TABS_ID, "value"),
+        ],
+        [
+            State("activities-store", "data"),
+            State(loaded_store_id("graphs", "map"), "data"),
         ],
-        State("activities-store", "data"),
     )
-    def update_graphs(pathname, time_dist, pace_speed, trace_color, data):
+    def update_map(pathname, trace_color, active_tab, version, loaded):
         """
-        Update the graphs.
+        Update the map (when the tab is shown).
         """
         if pathname is None or "/activity" not in pathname:
             raise PreventUpdate
-        if data is None or data == {}:
+        if trace_color is None:
+            raise PreventUpdate
+        if version is None:
             raise PreventUpdate
 
-        activity_id = int(pathname.split("/")[-1])
-
-        activity_streams = CLIENT.get_activity_streams(
-            activity_id,
-            [
-                "time",
-                "latlng",
-                "distance",
-                "altitude",
-                "velocity_smooth",
-                "heartrate",
-                "cadence",
-                "watts",
-                "grade_smooth",
-            ],
-        )
-
-        return (
-            create_speed_graph(
-                activity_streams, time_dist == "time", pace_speed == "pace"
-            ),
-            create_ele_graph(activity_streams, time_dist == "time"),
-            create_heartrate_graph(activity_streams, time_dist == "time"),
-            create_map(activity_streams, trace_color),
-        )
+        loaded = check_loaded("graphs", active_tab, loaded, pathname, trace_color)
+        return create_map(int(pathname.split("/")[-1]), trace_color), loaded
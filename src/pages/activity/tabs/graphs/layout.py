@@ -7,6 +7,8 @@ This module contains the layout of the Graphs tab of the Activity page.
 import dash_mantine_components as dmc
 from dash import dcc, html
 
+from pages.activity.tabs.loading import LoadedStore
+
 from .callbacks import register_callbacks
 
 register_callbacks()
@@ -18,30 +20,21 @@ def GraphsLayout():
     """
     return dmc.Stack(
         [
+            dcc.Store(
+                id={
+                    "page": "activity",
+                    "tab": "graphs",
+                    "component": "streams-store",
+                }
+            ),  # Downsampled streams of the graph (columnar buffer)
+            LoadedStore("graphs", "streams"),
+            LoadedStore("graphs", "map"),
             dmc.Card(
                 dcc.Graph(
                     id={
                         "page": "activity",
                         "tab": "graphs",
-                        "component": "speed-graph",
-                    },
-                ),
-            ),
-            dmc.Card(
-                dcc.Graph(
-                    id={
-                        "page": "activity",
-                        "tab": "graphs",
-                        "component": "ele-graph",
-                    },
-                ),
-            ),
-            dmc.Card(
-                dcc.Graph(
-                    id={
-                        "page": "activity",
-                        "tab": "graphs",
-                        "component": "heartrate-graph",
+                        "component": "streams-graph",
                     },
                 ),
             ),
@@ -0,0 +1,64 @@
+# pylint: disable=invalid-name
+# Disable invalid name to match dash PascalCase
+"""
+This module contains the utilities used to load the tabs of the Activity
+page on demand.
+"""
+
+from dash import dcc
+from dash.exceptions import PreventUpdate
+
+# ID of the tabs of the Activity page
+TABS_ID = {"page": "activity", "component": "tabs"}
+
+
+def loaded_store_id(tab: str, name: str) -> dict:
+    """
+    Return the ID of the LoadedStore of a tab content.
+
+    Args:
+        tab (str): Tab of the content.
+        name (str): Name of the content.
+
+    Returns:
+        dict: Component ID.
+    """
+    return {"page": "activity", "tab": tab, "component": f"{name}-loaded-store"}
+
+
+def LoadedStore(tab: str, name: str):
+    """
+    Create a store containing the inputs a tab content was last computed
+    with.
+
+    Args:
+        tab (str): Tab of the content.
+        name (str): Name of the content.
+
+    Returns:
+        dcc.Store: Store component.
+    """
+    return dcc.Store(id=loaded_store_id(tab, name))
+
+
+def check_loaded(tab: str, active_tab: str, loaded: list | None, *inputs) -> list:
+    """
+    Check whether a tab content has to be computed: the tab must be
+    shown and the content must not have been computed with the same
+    inputs already.
+
+    Args:
+        tab (str): Tab of the content.
+        active_tab (str): Tab currently shown.
+        loaded (list | None): Inputs the content was last computed with.
+        *inputs: Inputs of the content.
+
+    Raises:
+        PreventUpdate: If the content does not have to be computed.
+
+    Returns:
+        list: Inputs to save in the LoadedStore of the content.
+    """
+    if active_tab != tab or loaded == list(inputs):
+        raise PreventUpdate
+    return list(inputs)
@@ -2,11 +2,12 @@
 This module contains the callbacks of the Overview tab of the Activity page.
 """
 
-import polars as pl
 from dash import Input, Output, State, callback
 from dash.exceptions import PreventUpdate
 
 from constants.colors import SPORT_TYPE_COLORS
+from pages.activity.tabs.loading import TABS_ID, check_loaded, loaded_store_id
+from storage.store import STORE
 from utils.maps import create_map
 
 
@@ -16,41 +17,52 @@ def register_callbacks():
     """
 
     @callback(
-        Output(
-            {
-                "page": "activity",
-                "tab": "overview",
-                "component": "graph",
-            },
-            "figure",
-        ),
+        [
+            Output(
+                {
+                    "page": "activity",
+                    "tab": "overview",
+                    "component": "graph",
+                },
+                "figure",
+            ),
+            Output(loaded_store_id("overview", "map"), "data"),
+        ],
         [
             Input("url", "pathname"),
             Input(
                 {"page": "activity", "component": "overview-map-layer-select"}, "value"
             ),
+            Input(TABS_ID, "value"),
+        ],
+        [
+            State("activities-store", "data"),
+            State(loaded_store_id("overview", "map"), "data"),
         ],
-        State("activities-store", "data"),
     )
-    def update_map(pathname, map_layer, data):
+    def update_map(pathname, map_layer, active_tab, version, loaded):
         """
-        Update the map.
+        Update the map (when the tab is shown).
         """
         if pathname is None or "/activity" not in pathname:
             raise PreventUpdate
-        if data is None or data == {}:
+        if version is None:
             raise PreventUpdate
 
-        activity_data = pl.DataFrame(data).filter(
-            pl.col("id") == int(pathname.split("/")[-1])
+        loaded = check_loaded(
+            "overview", active_tab, loaded, pathname, map_layer, version
         )
 
-        if activity_data.is_empty():
+        activity_data = STORE.get(version).activity(int(pathname.split("/")[-1]))
+
+        if activity_data is None:
             raise PreventUpdate
 
-        activity_data = activity_data.row(0)
-        return create_map(
-            polyline_str=activity_data[22]["summary_polyline"],
-            color=SPORT_TYPE_COLORS[activity_data[29]],
-            map_layer=map_layer,
+        return (
+            create_map(
+                polyline_str=activity_data["map"]["summary_polyline"],
+                color=SPORT_TYPE_COLORS[activity_data["sport_type"]],
+                map_layer=map_layer,
+            ),
+            loaded,
         )
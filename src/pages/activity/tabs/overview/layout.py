@@ -7,6 +7,8 @@ This module contains the layout of the Overview tab of the Activity page.
 import dash_mantine_components as dmc
 from dash import dcc
 
+from pages.activity.tabs.loading import LoadedStore
+
 from .callbacks import register_callbacks
 
 register_callbacks()
@@ -18,6 +20,7 @@ def OverviewLayout():
     """
     return dmc.Stack(
         [
+            LoadedStore("overview", "map"),
             dmc.Card(
                 dcc.Graph(
                     id={
@@ -27,6 +30,6 @@ def OverviewLayout():
                     },
                     style={"height": "70vh"},
                 ),
-            )
+            ),
         ]
     )
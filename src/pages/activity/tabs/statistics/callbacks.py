@@ -4,10 +4,12 @@ This module contains the callbacks of the Overview tab of the Activity page.
 
 import time
 
-import polars as pl
 from dash import Input, Output, State, callback
 from dash.exceptions import PreventUpdate
 
+from pages.activity.tabs.loading import TABS_ID, check_loaded, loaded_store_id
+from storage.store import STORE
+
 
 def register_callbacks():
     """
@@ -18,8 +20,8 @@ def register_callbacks():
         if value is None:
             return ""
         if isinstance(value, float):
-            return f"{value:.2f} {unit}"
-        return f"{value} {unit}"
+            return f"{value:.2f} {unit}".strip()
+        return f"{value} {unit}".strip()
 
     @callback(
         [
@@ -71,151 +73,165 @@ def register_callbacks():
                 },
                 "data",
             ),
+            Output(loaded_store_id("statistics", "tables"), "data"),
+        ],
+        [
+            Input("url", "pathname"),
+            Input(TABS_ID, "value"),
+        ],
+        [
+            State("activities-store", "data"),
+            State(loaded_store_id("statistics", "tables"), "data"),
         ],
-        Input("url", "pathname"),
-        State("activities-store", "data"),
     )
-    def update_tables(pathname, data):
+    def update_tables(pathname, active_tab, version, loaded):
         """
-        Update the statistics tables.
+        Update the statistics tables (when the tab is first shown).
         """
         if pathname is None or "/activity" not in pathname:
             raise PreventUpdate
-        if data is None or data == {}:
+        if version is None:
             raise PreventUpdate
 
-        activity_data = pl.DataFrame(data).filter(
-            pl.col("id") == int(pathname.split("/")[-1])
-        )
+        loaded = check_loaded("statistics", active_tab, loaded, pathname, version)
 
-        if activity_data.is_empty():
+        activity_data = STORE.get(version).activity(int(pathname.split("/")[-1]))
+
+        if activity_data is None:
             raise PreventUpdate
 
         return [
             {
                 "body": [
-                    ["Type", activity_data["type"].item()],
-                    ["Sport Type", activity_data["sport_type"].item()],
-                    ["Workout Type", activity_data["workout_type"].item()],
-                    ["Trainer", str(activity_data["trainer"].item())],
-                    ["Commute", str(activity_data["commute"].item())],
+                    ["Type", activity_data["type"]],
+                    ["Sport Type", activity_data["sport_type"]],
+                    ["Workout Type", activity_data["workout_type"]],
+                    ["Trainer", str(activity_data["trainer"])],
+                    ["Commute", str(activity_data["commute"])],
                 ],
             },
             {
                 "body": [
                     [
                         "Distance",
-                        create_stat(activity_data["distance"].item() / 1000, "km"),
+                        create_stat(activity_data["distance"] / 1000, "km"),
                     ],
                     [
                         "Total Elevation Gain",
-                        create_stat(activity_data["total_elevation_gain"].item(), "m"),
+                        create_stat(activity_data["total_elevation_gain"], "m"),
                     ],
                     [
                         "Elapsed Time",
                         time.strftime(
                             "%H:%M:%S",
-                            time.gmtime(activity_data["elapsed_time"].item()),
+                            time.gmtime(activity_data["elapsed_time"]),
                         ),
                     ],
                     [
                         "Moving Time",
                         time.strftime(
-                            "%H:%M:%S", time.gmtime(activity_data["moving_time"].item())
+                            "%H:%M:%S", time.gmtime(activity_data["moving_time"])
                         ),
                     ],
                     [
                         "Average Pace",
                         create_stat(
-                            60 / (activity_data["average_speed"].item() * 3.6), "min/km"
+                            60 / (activity_data["average_speed"] * 3.6), "min/km"
                         ),
                     ],
                     [
                         "Max Pace",
-                        create_stat(
-                            60 / (activity_data["max_speed"].item() * 3.6), "min/km"
-                        ),
+                        create_stat(60 / (activity_data["max_speed"] * 3.6), "min/km"),
                     ],
                     [
                         "Average Speed",
-                        create_stat(
-                            activity_data["average_speed"].item() * 3.6, "km/h"
-                        ),
+                        create_stat(activity_data["average_speed"] * 3.6, "km/h"),
                     ],
                     [
                         "Max Speed",
-                        create_stat(activity_data["max_speed"].item() * 3.6, "km/h"),
+                        create_stat(activity_data["max_speed"] * 3.6, "km/h"),
+                    ],
+                    [
+                        "Average Cadence",
+                        create_stat(activity_data["average_cadence"], ""),
                     ],
-                    ["Average Cadence", activity_data["average_cadence"].item()],
                     [
                         "Average Heartrate",
-                        create_stat(activity_data["average_heartrate"].item(), "bpm"),
+                        create_stat(activity_data["average_heartrate"], "bpm"),
                     ],
                     [
                         "Max Heartrate",
-                        create_stat(activity_data["max_heartrate"].item(), "bpm"),
+                        create_stat(activity_data["max_heartrate"], "bpm"),
                     ],
                     [
                         "Average Watts",
-                        create_stat(activity_data["average_watts"].item(), "W"),
+                        create_stat(activity_data["average_watts"], "W"),
                     ],
                     [
                         "Weighted Average Watts",
-                        create_stat(
-                            activity_data["weighted_average_watts"].item(), "W"
-                        ),
+                        create_stat(activity_data["weighted_average_watts"], "W"),
                     ],
                     [
                         "Max Watts",
-                        create_stat(activity_data["max_watts"].item(), "W"),
+                        create_stat(activity_data["max_watts"], "W"),
                     ],
                     [
                         "Device Watts",
-                        create_stat(activity_data["device_watts"].item(), "W"),
+                        create_stat(activity_data["device_watts"], "W"),
+                    ],
+                    [
+                        "Kilojoules",
+                        create_stat(activity_data["kilojoules"], "kJ"),
                     ],
-                    ["Kilojoules", activity_data["kilojoules"].item()],
-                    ["Suffer Score", activity_data["suffer_score"].item()],
+                    ["Suffer Score", activity_data["suffer_score"]],
                 ]
             },
             {
                 "body": [
-                    ["Gear ID", activity_data["gear_id"].item()],
+                    ["Gear ID", activity_data["gear_id"]],
                 ]
             },
             {
                 "body": [
-                    ["Location City", activity_data["location_city"].item()],
-                    ["Location State", activity_data["location_state"].item()],
-                    ["Location Country", activity_data["location_country"].item()],
+                    ["Location City", activity_data["location_city"]],
+                    ["Location State", activity_data["location_state"]],
+                    ["Location Country", activity_data["location_country"]],
                     [
                         "Start Coordinates",
-                        activity_data["start_latlng"].item().to_list(),
+                        activity_data["start_latlng"],
+                    ],
+                    ["End Coordinates", activity_data["end_latlng"]],
+                    [
+                        "Elevation Low",
+                        create_stat(activity_data["elev_low"], "m"),
+                    ],
+                    [
+                        "Elevation High",
+                        create_stat(activity_data["elev_high"], "m"),
                     ],
-                    ["End Coordinates", activity_data["end_latlng"].item().to_list()],
-                    ["Elevation Low", activity_data["elev_low"].item()],
-                    ["Elevation High", activity_data["elev_high"].item()],
                 ]
             },
             {
                 "body": [
-                    ["Start Date", activity_data["start_date"].item()],
-                    ["Start Date Local", activity_data["start_date_local"].item()],
-                    ["Timezone", activity_data["timezone"].item()],
-                    ["UTC Offset", activity_data["utc_offset"].item()],
+                    ["Start Date", activity_data["start_date"]],
+                    ["Start Date Local", activity_data["start_date_local"]],
+                    ["Timezone", activity_data["timezone"]],
+                    ["UTC Offset", activity_data["utc_offset"]],
                 ]
             },
             {
                 "body": [
-                    ["Activity ID", activity_data["id"].item()],
-                    ["Private", str(activity_data["private"].item())],
-                    ["Visibility", activity_data["visibility"].item()],
-                    ["Athlete Count", activity_data["athlete_count"].item()],
-                    ["Kudos Count", activity_data["kudos_count"].item()],
-                    ["Comment Count", activity_data["comment_count"].item()],
-                    ["Achievements Count", activity_data["achievement_count"].item()],
-                    ["PR Count", activity_data["pr_count"].item()],
-                    ["Photo Count", activity_data["photo_count"].item()],
-                    ["Total Photo Count", activity_data["total_photo_count"].item()],
+                    ["Activity ID", activity_data["id"]],
+                    ["Private", str(activity_data["private"])],
+                    ["Visibility", activity_data["visibility"]],
+                    ["Athlete Count", activity_data["athlete_count"]],
+                    ["Kudos Count", activity_data["kudos_count"]],
+                    ["Comment Count", activity_data["comment_count"]],
+                    ["Achievements Count", activity_data["achievement_count"]],
+                    ["PR Count", activity_data["pr_count"]],
+                    ["Photo Count", activity_data["photo_count"]],
+                    ["Total Photo Count", activity_data["total_photo_count"]],
                 ]
             },
+            loaded,
         ]
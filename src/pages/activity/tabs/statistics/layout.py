@@ -6,6 +6,8 @@ This module contains the layout of the Statistics tab of the Activity page.
 
 import dash_mantine_components as dmc
 
+from pages.activity.tabs.loading import LoadedStore
+
 from .callbacks import register_callbacks
 
 register_callbacks()
@@ -149,6 +151,11 @@ def StatisticsLayout():
     """
     return dmc.Card(
         dmc.Stack(
-            [FirstRowLayout(), SecondRowLayout(), ThirdRowLayout()],
+            [
+                LoadedStore("statistics", "tables"),
+                FirstRowLayout(),
+                SecondRowLayout(),
+                ThirdRowLayout(),
+            ],
         )
     )
@@ -3,15 +3,25 @@ This module contains the callbacks of the Calendar page.
 """
 
 import datetime
+from functools import lru_cache
 
 import dash_mantine_components as dmc
-import polars as pl
-from dash import Input, Output, callback
+from dash import Input, Output, Patch, State, callback, clientside_callback
 from dash.exceptions import PreventUpdate
 
-from constants.colors import DIFFICULTY_COLORMAP, MONTH_COLORS, SPORT_TYPE_COLORS
-from utils.dataframes import create_weekly_df
-from utils.dates import iso_weeks_in_year
+from constants.colors import DIFFICULTY_COLORMAP, SPORT_TYPE_COLORS
+from storage.figures import FIGURE_CACHE
+from storage.store import STORE
+from storage.worker import request_history
+from templates.components.listeners import NEAR_BOTTOM
+from utils.dataframes import create_calendar_df
+from utils.dates import date_range_to_utc
+
+# Number of weeks rendered at once
+WEEKS_PER_PAGE = 12
+
+# Number of calendar dataframes kept in memory (for scrolling)
+CALENDAR_CACHE_SIZE = 8
 
 
 def register_callbacks():
@@ -19,25 +29,19 @@ def register_callbacks():
     Register callbacks of the Calendar page.
     """
 
-    @callback(
-        Output({"page": "calendar", "component": "calendar"}, "children"),
-        [
-            Input("url", "pathname"),
-            Input({"page": "calendar", "component": "sport-type-select"}, "value"),
-            Input("activities-store", "data"),
-        ],
-    )
-    def update_calendar(_, sport_types, data):
-        """
-        Update the calendar.
-        """
-        if sport_types is None or sport_types == []:
-            raise PreventUpdate
-        if data is None or data == {}:
-            raise PreventUpdate
+    def create_badge(activity):
+        return dmc.Anchor(
+            dmc.Badge(
+                f"{activity['sport_type']}: {activity['distance'] / 1000:.2f} km",
+                color=SPORT_TYPE_COLORS.get(activity["sport_type"], "gray"),
+                variant="filled",
+                style={"margin": "2px"},
+            ),
+            href=f"/datamountain/activity/{activity['id']}",
+        )
 
-        # Create table head
-        head = dmc.TableThead(
+    def create_head():
+        return dmc.TableThead(
             dmc.TableTr(
                 [
                     dmc.TableTh("Monday"),
@@ -52,247 +56,168 @@ def register_callbacks():
             )
         )
 
-        # Create dataframe from data
-        df = (
-            pl.DataFrame(data)
-            .select(
-                [
-                    "id",
-                    "type",
-                    "sport_type",
-                    "start_date_local",
-                    "distance",
-                    "elapsed_time",
-                    "total_elevation_gain",
-                ]
-            )
-            .filter(pl.col("sport_type").is_in(sport_types))
-            .with_columns(
-                pl.col("start_date_local").str.to_datetime("%Y-%m-%dT%H:%M:%S+00:00")
-            )
-            .with_columns(
-                pl.col("start_date_local").dt.iso_year().alias("iso_year"),
-                pl.col("start_date_local").dt.week().alias("iso_week"),
-                pl.col("start_date_local").dt.weekday().alias("weekday"),
-            )
+    @lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+    def _create_calendar(version, sport_types, start_date, stop_date):
+        dataset = STORE.get(version)
+        return create_calendar_df(
+            dataset.df,
+            dataset.rollups.weekly,
+            list(sport_types),
+            datetime.datetime.strptime(start_date, "%Y-%m-%d").date(),
+            datetime.datetime.strptime(stop_date, "%Y-%m-%d").date(),
         )
 
-        # Create weekly dataframe
-        tmp = (
-            create_weekly_df(
-                pl.DataFrame(data),
-                sport_types,
-                start_date=df.get_column("start_date_local").min().date(),
-                stop_date=df.get_column("start_date_local").max().date()
-                + datetime.timedelta(days=1),  # Include last day
-            )
-            .group_by(["iso_year", "iso_week", "type"])
-            .agg(
-                [
-                    pl.col("distance").sum(),
-                    pl.col("elapsed_time").sum(),
-                    pl.col("total_elevation_gain").sum(),
-                ]
-            )
-        )
-        weekly_df = pl.concat(
-            [
-                tmp,
-                tmp.group_by("iso_year", "iso_week")
-                .sum()
-                .with_columns(pl.col("type").fill_null(pl.lit("Total"))),
-            ]
+    def create_calendar(version, sport_types, start_date, stop_date):
+        # Computed once per selection so that scrolling only renders rows
+        return _create_calendar(
+            version, tuple(sorted(sport_types)), start_date, stop_date
         )
 
+    def create_rows(calendar_df, offset):
         # Scale difficulty colormap based on weekly distance
-        weekly_max_dist = (
-            weekly_df.filter(pl.col("type") == "Total").get_column("distance").max()
+        weekly_difficulty_colormap = DIFFICULTY_COLORMAP.scale(
+            0, calendar_df.get_column("total_distance").max() or 1
         )
-        weekly_difficulty_colormap = DIFFICULTY_COLORMAP.scale(0, weekly_max_dist)
 
-        body_children = []
-        # Iterate over ISO years
-        for iso_year in range(
-            df.get_column("iso_year").max(), df.get_column("iso_year").min() - 1, -1
-        ):
-            df_year = df.filter(pl.col("iso_year") == iso_year)
-            # Iterate over ISO calendar weeks
-            last_week = (
-                df_year.get_column("iso_week").max()
-                if iso_year == df.get_column("iso_year").max()
-                else iso_weeks_in_year(iso_year)
-            )
-            first_week = (
-                df_year.get_column("iso_week").min()
-                if iso_year == df.get_column("iso_year").min()
-                else 0
-            )
-            for iso_week in range(last_week, first_week, -1):
-                df_week = df_year.filter(pl.col("iso_week") == iso_week)
-                if df_week.height == 0:
-                    body_children.append(
-                        dmc.TableTr(
+        rows = []
+        # Iterate over weeks of the window
+        for week in calendar_df.slice(offset, WEEKS_PER_PAGE).iter_rows(named=True):
+            row_children = [
+                dmc.TableTd(
+                    [create_badge(activity) for activity in activities]
+                    if activities is not None
+                    else "",
+                    bg=color,
+                )
+                for activities, color in zip(week["activities"], week["color"])
+            ]
+            if week["total_distance"] is None:
+                row_children.append(
+                    dmc.TableTd(f"Calendar Week {week['iso_week']}", bg="lightgray")
+                )
+            else:
+                row_children.append(
+                    dmc.TableTd(
+                        dmc.Stack(
                             [
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 1
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 2
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 3
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 4
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 5
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 6
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, 7
-                                        ).month
-                                    ],
-                                ),
-                                dmc.TableTd(
-                                    f"Calendar Week {iso_week}", bg="lightgray"
-                                ),
+                                dmc.Text(f"Calendar Week {week['iso_week']}"),
+                                dmc.Text(f"Running: {week['running_distance']:.2f} km"),
+                                dmc.Text(f"Cycling: {week['cycling_distance']:.2f} km"),
+                                dmc.Text(f"Total: {week['total_distance']:.2f} km"),
                             ]
-                        )
-                    )
-                else:
-                    row_children = []
-                    # Iterate over weekdays
-                    for weekday in range(1, 8):
-                        df_day = df_week.filter(pl.col("weekday") == weekday)
-                        if df_day.height == 0:
-                            row_children.append(
-                                dmc.TableTd(
-                                    "",
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, weekday
-                                        ).month
-                                    ],
-                                )
-                            )
-                        else:
-                            day_children = []
-                            for activity in df_day.iter_rows(named=True):
-                                color = SPORT_TYPE_COLORS.get(
-                                    activity["sport_type"], "gray"
-                                )
-                                distance_km = activity["distance"] / 1000
-                                day_children.append(
-                                    dmc.Anchor(
-                                        dmc.Badge(
-                                            f"{activity['sport_type']}: {distance_km:.2f} km",
-                                            color=color,
-                                            variant="filled",
-                                            style={"margin": "2px"},
-                                        ),
-                                        href=f"/datamountain/activity/{activity['id']}",
-                                    )
-                                )
-                            row_children.append(
-                                dmc.TableTd(
-                                    day_children,
-                                    bg=MONTH_COLORS[
-                                        datetime.datetime.fromisocalendar(
-                                            iso_year, iso_week, weekday
-                                        ).month
-                                    ],
-                                )
-                            )
-                    weekly_running_dist = (
-                        weekly_df.filter(
-                            (pl.col("type") == "Run")
-                            & (pl.col("iso_year") == iso_year)
-                            & (pl.col("iso_week") == iso_week)
-                        )
-                        .get_column("distance")
-                        .item()
-                        if any(x in ["Run", "TrailRun"] for x in sport_types)
-                        else 0.0
+                        ),
+                        bg=weekly_difficulty_colormap(
+                            week["total_distance"]
+                        ),  # TODO find better way to measure difficulty (activity coefficients, elevation gain...)
                     )
-                    weekly_cycling_dist = (
-                        weekly_df.filter(
-                            (pl.col("type") == "Ride")
-                            & (pl.col("iso_year") == iso_year)
-                            & (pl.col("iso_week") == iso_week)
-                        )
-                        .get_column("distance")
-                        .item()
-                        if any(
-                            x in ["Ride", "MountainBikeRide", "GravelBikeRide"]
-                            for x in sport_types
-                        )
-                        else 0.0
-                    )
-                    weekly_total_dist = (
-                        weekly_df.filter(
-                            (pl.col("type") == "Total")
-                            & (pl.col("iso_year") == iso_year)
-                            & (pl.col("iso_week") == iso_week)
-                        )
-                        .get_column("distance")
-                        .item()
-                        if len(sport_types) > 0
-                        else 0.0
-                    )
-                    row_children.append(
-                        dmc.TableTd(
-                            dmc.Stack(
-                                [
-                                    dmc.Text(f"Calendar Week {iso_week}"),
-                                    dmc.Text(f"Running: {weekly_running_dist:.2f} km"),
-                                    dmc.Text(f"Cycling: {weekly_cycling_dist:.2f} km"),
-                                    dmc.Text(f"Total: {weekly_total_dist:.2f} km"),
-                                ]
-                            ),
-                            bg=weekly_difficulty_colormap(
-                                weekly_total_dist
-                            ),  # TODO find better way to measure difficulty (activity coefficients, elevation gain...)
-                        )
-                    )
-                    body_children.append(dmc.TableTr(row_children))
+                )
+            rows.append(dmc.TableTr(row_children))
+        return rows
+
+    @FIGURE_CACHE.memoize
+    def create_first_weeks(version, sport_types, start_date, stop_date):
+        # Create calendar dataframe
+        calendar_df = create_calendar(version, sport_types, start_date, stop_date)
+        if calendar_df.is_empty():
+            return [create_head(), dmc.TableTbody([])], 0
 
         # Create table body
-        body = dmc.TableTbody(body_children)
+        body = dmc.TableTbody(create_rows(calendar_df, 0))
+
+        return [create_head(), body], min(WEEKS_PER_PAGE, calendar_df.height)
+
+    @callback(
+        [
+            Output({"page": "calendar", "component": "calendar"}, "children"),
+            Output({"page": "calendar", "component": "weeks-store"}, "data"),
+        ],
+        [
+            Input("url", "pathname"),
+            Input({"page": "calendar", "component": "sport-type-select"}, "value"),
+            Input({"page": "calendar", "component": "start-date-picker"}, "value"),
+            Input({"page": "calendar", "component": "stop-date-picker"}, "value"),
+            Input("activities-store", "data"),
+        ],
+    )
+    def update_calendar(_, sport_types, start_date, stop_date, version):
+        """
+        Update the calendar with the first weeks of the date range.
+        """
+        if sport_types is None or sport_types == []:
+            raise PreventUpdate
+        if start_date is None or stop_date is None:
+            raise PreventUpdate
+        if version is None:
+            raise PreventUpdate
+
+        # Rows are cached for the same inputs and dataset version
+        return create_first_weeks(version, sport_types, start_date, stop_date)
+
+    @callback(
+        Input({"page": "calendar", "component": "start-date-picker"}, "value"),
+        Input({"page": "calendar", "component": "stop-date-picker"}, "value"),
+    )
+    def load_date_range(start_date, stop_date):
+        """
+        Request the activities of the date range missing from the local
+        store (they are loaded by the synchronisation worker and published
+        as a new dataset version, which updates the calendar).
+        """
+        if start_date is None or stop_date is None:
+            raise PreventUpdate
+
+        start, stop = date_range_to_utc(start_date, stop_date)
+        if start >= stop:
+            raise PreventUpdate
+
+        request_history(start, stop)
+
+    clientside_callback(
+        NEAR_BOTTOM,
+        Output({"page": "calendar", "component": "scroll-store"}, "data"),
+        Input({"page": "calendar", "component": "scroll-listener"}, "event"),
+    )  # Request more weeks when the calendar is scrolled near its bottom
+
+    @callback(
+        [
+            Output(
+                {"page": "calendar", "component": "calendar"},
+                "children",
+                allow_duplicate=True,
+            ),
+            Output(
+                {"page": "calendar", "component": "weeks-store"},
+                "data",
+                allow_duplicate=True,
+            ),
+        ],
+        Input({"page": "calendar", "component": "scroll-store"}, "data"),
+        [
+            State({"page": "calendar", "component": "sport-type-select"}, "value"),
+            State({"page": "calendar", "component": "start-date-picker"}, "value"),
+            State({"page": "calendar", "component": "stop-date-picker"}, "value"),
+            State("activities-store", "data"),
+            State({"page": "calendar", "component": "weeks-store"}, "data"),
+        ],
+        prevent_initial_call=True,
+    )
+    def load_more_weeks(_, sport_types, start_date, stop_date, version, n_weeks):
+        """
+        Append the next weeks of the date range to the calendar.
+        """
+        if sport_types is None or sport_types == []:
+            raise PreventUpdate
+        if start_date is None or stop_date is None:
+            raise PreventUpdate
+        if version is None or not n_weeks:
+            raise PreventUpdate
+
+        calendar_df = create_calendar(version, sport_types, start_date, stop_date)
+        if n_weeks >= calendar_df.height:
+            raise PreventUpdate
+
+        # Only send the new rows
+        children = Patch()
+        children[1]["props"]["children"].extend(create_rows(calendar_df, n_weeks))
 
-        return [head, body]
+        return children, min(n_weeks + WEEKS_PER_PAGE, calendar_df.height)
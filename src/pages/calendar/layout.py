@@ -4,6 +4,9 @@ This module contains the layout of the Calendar page.
 
 import dash
 import dash_mantine_components as dmc
+from dash import dcc
+
+from templates.components.listeners import ScrollListener
 
 from .callbacks import register_callbacks
 
@@ -12,20 +15,31 @@ dash.register_page(__name__, name="Calendar", path="/calendar", order=2)
 register_callbacks()
 
 layout = dmc.Container(
-    dmc.Card(
-        dmc.TableScrollContainer(
-            dmc.Table(
-                id={"page": "calendar", "component": "calendar"},
-                striped=False,
-                highlightOnHover=True,
-                withTableBorder=True,
-                withColumnBorders=True,
-                stickyHeader=True,
+    [
+        dmc.Card(
+            ScrollListener(
+                {"page": "calendar", "component": "scroll-listener"},
+                dmc.TableScrollContainer(
+                    dmc.Table(
+                        id={"page": "calendar", "component": "calendar"},
+                        striped=False,
+                        highlightOnHover=True,
+                        withTableBorder=True,
+                        withColumnBorders=True,
+                        stickyHeader=True,
+                    ),
+                    type="scrollarea",
+                    minWidth="100%",
+                    style={"height": "80vh"},
+                ),
             ),
-            type="scrollarea",
-            minWidth="100%",
-            style={"height": "80vh"},
         ),
-    ),
+        dcc.Store(
+            id={"page": "calendar", "component": "weeks-store"}
+        ),  # Number of weeks rendered
+        dcc.Store(
+            id={"page": "calendar", "component": "scroll-store"}
+        ),  # Time of the latest request for more weeks
+    ],
     fluid=True,
 )
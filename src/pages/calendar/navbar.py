@@ -4,7 +4,10 @@
 This module contains the layout of the Calendar page navbar.
 """
 
+import datetime
+
 import dash_mantine_components as dmc
+from dash_iconify import DashIconify
 
 from templates.components.selects import SportTypeSelect
 
@@ -17,5 +20,19 @@ def CalendarNavbar():
         [
             dmc.Title("Calendar", order=1),
             SportTypeSelect({"page": "calendar", "component": "sport-type-select"}),
+            dmc.DatePickerInput(
+                id={"page": "calendar", "component": "start-date-picker"},
+                label="Start Date",
+                valueFormat="DD/MM/YYYY",
+                value=(datetime.datetime.now() - datetime.timedelta(days=365)).date(),
+                leftSection=DashIconify(icon="ic:baseline-calendar-month"),
+            ),
+            dmc.DatePickerInput(
+                id={"page": "calendar", "component": "stop-date-picker"},
+                label="Stop Date",
+                valueFormat="DD/MM/YYYY",
+                value=datetime.datetime.now().date(),
+                leftSection=DashIconify(icon="ic:baseline-calendar-month"),
+            ),
         ]
     )
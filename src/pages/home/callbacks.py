@@ -4,14 +4,17 @@ This module contains the callbacks of the Home page.
 
 import datetime
 
-import plotly.express as px
 import plotly.graph_objects as go
 import polars as pl
 from dash import Input, Output, callback
 from dash.exceptions import PreventUpdate
 
 from constants.colors import SPORT_TYPE_COLORS
+from storage.figures import FIGURE_CACHE
+from storage.store import STORE
+from storage.worker import request_history
 from utils.dataframes import create_weekly_df
+from utils.dates import date_range_to_utc
 
 SPORT_TYPE_ORDER = [
     # Running
@@ -29,6 +32,19 @@ SPORT_TYPE_ORDER = [
     "Swim",
 ]
 
+HOVERTEMPLATES = {
+    "distance": "Year-Week: %{x}<br>Distance: %{y:.1f} km",
+    "elapsed_time": "Year-Week: %{x}<br>Elapsed time: %{y:.1f} min",
+    "total_elevation_gain": "Year-Week: %{x}<br>Elevation gain: %{y:.1f} m",
+}
+
+# Measures of the bargraphs (and their axis title)
+BAR_MEASURES = {
+    "distance": "Distance",
+    "elapsed_time": "Elapsed Time",
+    "total_elevation_gain": "Elevation Gain",
+}
+
 
 def register_callbacks():
     """
@@ -38,11 +54,6 @@ def register_callbacks():
     ## Graphs #########################################################
 
     def create_plot(df, y):
-        hovertemplates = {
-            "distance": "Year-Week: %{x}<br>Distance: %{y:.1f} km",
-            "elapsed_time": "Year-Week: %{x}<br>Elapsed time: %{y:.1f} min",
-            "total_elevation_gain": "Year-Week: %{x}<br>Elevation gain: %{y:.1f} m",
-        }
         sport_types = df.get_column("sport_type").unique().sort().to_list()
         # Create figure
         fig = go.Figure()
@@ -52,7 +63,7 @@ def register_callbacks():
                 go.Scatter(
                     x=df_sport["year_week"].to_list(),
                     y=df_sport[y].to_list(),
-                    hovertemplate=hovertemplates[y],
+                    hovertemplate=HOVERTEMPLATES[y],
                     mode="lines+markers",
                     name=sport_type,
                     stackgroup="one",
@@ -68,63 +79,108 @@ def register_callbacks():
         )
         return fig
 
-    ## Sport Type Bargraph ############################################
-
-    def create_bar(df, y, y_title, color="sport_type"):
-        year_weeks = df.get_column("year_week").unique().to_list()
-        fig = px.bar(
-            df,
-            x="year_week",
-            y=y,
-            color=color,
-            color_discrete_map=SPORT_TYPE_COLORS,
-            barmode="group",
-            category_orders={color: SPORT_TYPE_ORDER},
-            text_auto=".2f",
-        ).update_layout(
-            xaxis={
-                "title": None,
-                "type": "category",
-                "categoryorder": "array",
-                "categoryarray": year_weeks,
-            },
-            yaxis={"title": y_title},
-            barcornerradius=15,
+    ## Bargraphs #####################################################
+
+    def create_bars(df, color, aggregate=False):
+        # Aggregate all measures in one pass (one bar per week and color)
+        if aggregate:
+            df = df.group_by(["year_week", color], maintain_order=True).agg(
+                pl.col(list(BAR_MEASURES)).sum()
+            )
+        year_weeks = df.get_column("year_week").unique(maintain_order=True)
+
+        # Order traces like SPORT_TYPE_ORDER (other values last)
+        groups = df.partition_by(color, maintain_order=True, as_dict=True)
+        names = sorted(
+            (key[0] for key in groups),
+            key=lambda name: (
+                SPORT_TYPE_ORDER.index(name)
+                if name in SPORT_TYPE_ORDER
+                else len(SPORT_TYPE_ORDER)
+            ),
         )
-        for i in range(len(year_weeks) - 1):
-            fig.add_vline(
-                x=i + 0.5, line_width=1, line_dash="dot", line_color="gray", opacity=0.4
+
+        # Dotted lines between weeks
+        shapes = [
+            {
+                "type": "line",
+                "xref": "x",
+                "yref": "paper",
+                "x0": i + 0.5,
+                "x1": i + 0.5,
+                "y0": 0,
+                "y1": 1,
+                "line": {"width": 1, "dash": "dot", "color": "gray"},
+                "opacity": 0.4,
+            }
+            for i in range(len(year_weeks) - 1)
+        ]
+
+        figs = []
+        for y, y_title in BAR_MEASURES.items():
+            traces = []
+            for name in names:
+                group = groups[(name,)]
+                traces.append(
+                    go.Bar(
+                        x=group.get_column("year_week").to_numpy(),
+                        y=group.get_column(y).to_numpy(),
+                        name=name,
+                        legendgroup=name,
+                        offsetgroup=name,
+                        marker_color=SPORT_TYPE_COLORS.get(name),
+                        texttemplate="%{y:.2f}",
+                        hovertemplate=HOVERTEMPLATES[y],
+                    )
+                )
+            figs.append(
+                go.Figure(
+                    data=traces,
+                    layout={
+                        "xaxis": {
+                            "title": None,
+                            "type": "category",
+                            "categoryorder": "array",
+                            "categoryarray": year_weeks.to_list(),
+                        },
+                        "yaxis": {"title": y_title},
+                        "legend": {"title": {"text": color}},
+                        "barmode": "group",
+                        "barcornerradius": 15,
+                        "shapes": shapes,
+                    },
+                )
             )
-        return fig
+        return tuple(figs)
 
-    ## Type Bargraph ##################################################
-
-    def create_bar_type(df, y, y_title):
-        year_weeks = df.get_column("year_week").unique().to_list()
-        fig = px.histogram(
-            df,
-            x="year_week",
-            y=y,
-            color="type",
-            color_discrete_map=SPORT_TYPE_COLORS,
-            barmode="group",
-            category_orders={"type": SPORT_TYPE_ORDER},
-            text_auto=".2f",
-        ).update_layout(
-            xaxis={
-                "title": None,
-                "type": "category",
-                "categoryorder": "array",
-                "categoryarray": year_weeks,
-            },
-            yaxis={"title": y_title},
-            barcornerradius=15,
+    @FIGURE_CACHE.memoize
+    def create_graphs(sport_types, start_date, stop_date, graph_type, version):
+        # Convert start and stop dates
+        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
+        stop_date = datetime.datetime.strptime(stop_date, "%Y-%m-%d").date()
+
+        # Create dataframe from data
+        weekly_df = create_weekly_df(
+            STORE.get(version).rollups, sport_types, start_date, stop_date
+        ).with_columns(
+            pl.concat_str([pl.col("iso_year"), pl.lit("-"), pl.col("iso_week")]).alias(
+                "year_week"
+            )
         )
-        for i in range(len(year_weeks) - 1):
-            fig.add_vline(
-                x=i + 0.5, line_width=1, line_dash="dot", line_color="gray", opacity=0.4
+
+        if graph_type == "plot":
+            return (
+                create_plot(weekly_df, "distance"),
+                create_plot(weekly_df, "elapsed_time"),
+                create_plot(weekly_df, "total_elevation_gain"),
             )
-        return fig
+        if graph_type == "bar_type":
+            return create_bars(weekly_df, "type", aggregate=True)
+        if graph_type == "bar_type_sport_type":
+            return create_bars(weekly_df, "type")
+        if graph_type == "bar_sport_type":
+            return create_bars(weekly_df, "sport_type")
+        return None, None, None
 
     ## Callback #######################################################
 
@@ -143,50 +199,33 @@ def register_callbacks():
             Input("activities-store", "data"),
         ],
     )
-    def update_graphs(_, sport_types, start_date, stop_date, graph_type, data):
+    def update_graphs(_, sport_types, start_date, stop_date, graph_type, version):
         """
         Update the graphs.
         """
         if sport_types is None or sport_types == []:
             raise PreventUpdate
-        if data is None or data == {}:
+        if version is None:
             raise PreventUpdate
 
-        # Convert start and stop dates
-        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d").date()
-        stop_date = datetime.datetime.strptime(stop_date, "%Y-%m-%d").date()
+        # Figures are cached for the same inputs and dataset version
+        return create_graphs(sport_types, start_date, stop_date, graph_type, version)
 
-        # Create dataframe from data
-        weekly_df = create_weekly_df(
-            pl.DataFrame(data), sport_types, start_date, stop_date
-        ).with_columns(
-            pl.concat_str([pl.col("iso_year"), pl.lit("-"), pl.col("iso_week")]).alias(
-                "year_week"
-            )
-        )
+    @callback(
+        Input({"page": "home", "component": "start-date-picker"}, "value"),
+        Input({"page": "home", "component": "stop-date-picker"}, "value"),
+    )
+    def load_date_range(start_date, stop_date):
+        """
+        Request the activities of the date range missing from the local
+        store (they are loaded by the synchronisation worker and published
+        as a new dataset version).
+        """
+        if start_date is None or stop_date is None:
+            raise PreventUpdate
 
-        if graph_type == "plot":
-            return (
-                create_plot(weekly_df, "distance"),
-                create_plot(weekly_df, "elapsed_time"),
-                create_plot(weekly_df, "total_elevation_gain"),
-            )
-        if graph_type == "bar_type":
-            return (
-                create_bar_type(weekly_df, "distance", "Distance"),
-                create_bar_type(weekly_df, "elapsed_time", "Elapsed Time"),
-                create_bar_type(weekly_df, "total_elevation_gain", "Elevation Gain"),
-            )
-        if graph_type == "bar_type_sport_type":
-            return (
-                create_bar(weekly_df, "distance", "Distance", "type"),
-                create_bar(weekly_df, "elapsed_time", "Elapsed Time", "type"),
-                create_bar(weekly_df, "total_elevation_gain", "Elevation Gain", "type"),
-            )
-        if graph_type == "bar_sport_type":
-            return (
-                create_bar(weekly_df, "distance", "Distance"),
-                create_bar(weekly_df, "elapsed_time", "Elapsed Time"),
-                create_bar(weekly_df, "total_elevation_gain", "Elevation Gain"),
-            )
-        return None, None, None
+        start, stop = date_range_to_utc(start_date, stop_date)
+        if start >= stop:
+            raise PreventUpdate
+
+        request_history(start, stop)
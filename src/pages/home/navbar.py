@@ -26,7 +26,7 @@ def HomeNavbar():
                 valueFormat="DD/MM/YYYY",
                 value=(
                     datetime.datetime.now() - datetime.timedelta(days=30)
-                ).date(),  # TODO do something to load more data
+                ).date(),  # Earlier activities are loaded on demand
                 leftSection=DashIconify(icon="ic:baseline-calendar-month"),
             ),
             dmc.DatePickerInput(
@@ -4,12 +4,18 @@ This module contains the callbacks of the Map page.
 
 import datetime
 
+import dash
 import polars as pl
-from dash import Input, Output, callback
+from dash import Input, Output, callback, clientside_callback, ctx
 from dash.exceptions import PreventUpdate
 
 from constants.colors import SPORT_TYPE_COLORS
-from utils.maps import create_map
+from storage.figures import FIGURE_CACHE
+from storage.store import STORE
+from storage.tiles import MAX_TILE_ZOOM
+from storage.worker import request_history
+from utils.dates import date_range_to_utc
+from utils.maps import EXPAND_TRACK_NAMES, create_map, create_tile_map
 
 
 def register_callbacks():
@@ -17,47 +23,132 @@ def register_callbacks():
     Register callbacks of the Map page.
     """
 
+    def create_tracks_map(df, sport_types, start_date, stop_date, map_layer, zoom=None):
+        # Convert start and stop dates
+        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+        stop_date = datetime.datetime.strptime(stop_date, "%Y-%m-%d")
+
+        # Select activities
+        df = df.filter(
+            (pl.col("sport_type").is_in(sport_types))
+            & (pl.col("start_date_local").is_between(start_date, stop_date))
+        )
+
+        return create_map(
+            polyline_str=df.get_column("map")
+            .struct.field("summary_polyline")
+            .to_list(),
+            name=df["name"].to_list(),
+            color=[SPORT_TYPE_COLORS.get(st, "#FFA800") for st in df["sport_type"]],
+            map_layer=map_layer,
+            group=df["sport_type"].to_list(),
+            zoom=zoom,
+        ).update_layout(
+            # Keep the user viewport until the selection changes
+            uirevision=str((sorted(sport_types), start_date, stop_date))
+        )
+
+    @FIGURE_CACHE.memoize
+    def create_full_tracks_map(version, sport_types, start_date, stop_date, map_layer):
+        return create_tracks_map(
+            STORE.get(version).df, sport_types, start_date, stop_date, map_layer
+        )
+
+    @FIGURE_CACHE.memoize
+    def create_heatmap(version, map_layer):
+        # Tiles are rendered (and cached) by the server for the whole
+        # history, the dataset version makes browsers fetch new tiles
+        # after each synchronisation
+        dataset = STORE.get(version)
+        return create_tile_map(
+            dash.get_relative_path("/tiles/heatmap/{z}/{x}/{y}.png")
+            + f"?v={dataset.version}",
+            dataset.spatial_index.bboxes,
+            map_layer=map_layer,
+            max_zoom=MAX_TILE_ZOOM,
+        ).update_layout(uirevision="heatmap")
+
     @callback(
-        Output({"page": "map", "component": "map"}, "figure"),
+        Input({"page": "map", "component": "start-date-picker"}, "value"),
+        Input({"page": "map", "component": "stop-date-picker"}, "value"),
+    )
+    def load_date_range(start_date, stop_date):
+        """
+        Request the activities of the date range missing from the local
+        store (they are loaded by the synchronisation worker and published
+        as a new dataset version, which updates the map).
+        """
+        if start_date is None or stop_date is None:
+            raise PreventUpdate
+
+        start, stop = date_range_to_utc(start_date, stop_date)
+        if start >= stop:
+            raise PreventUpdate
+
+        request_history(start, stop)
+
+    @callback(
+        Output({"page": "map", "component": "map-store"}, "data"),
         [
             Input("url", "pathname"),
             Input({"page": "map", "component": "sport-type-select"}, "value"),
             Input({"page": "map", "component": "start-date-picker"}, "value"),
             Input({"page": "map", "component": "stop-date-picker"}, "value"),
             Input({"page": "map", "component": "map-layer-select"}, "value"),
+            Input({"page": "map", "component": "map-mode-control"}, "value"),
+            Input({"page": "map", "component": "map"}, "relayoutData"),
             Input("activities-store", "data"),
         ],
     )
-    def update_graph(_, sport_types, start_date, stop_date, map_layer, data):
+    def update_graph(
+        _,
+        sport_types,
+        start_date,
+        stop_date,
+        map_layer,
+        map_mode,
+        relayout_data,
+        version,
+    ):
         """
         Update the graph.
         """
         if sport_types is None or sport_types == []:
             raise PreventUpdate
-        if data is None or data == {}:
+        if version is None:
             raise PreventUpdate
 
-        # Convert start and stop dates
-        start_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        stop_date = datetime.datetime.strptime(stop_date, "%Y-%m-%d")
+        if map_mode == "heatmap":
+            if ctx.triggered_id == {"page": "map", "component": "map"}:
+                raise PreventUpdate
+            return create_heatmap(version, map_layer)
 
-        # Create dataframe from data
-        df = (
-            pl.DataFrame(data)
-            .with_columns(
-                pl.col("start_date_local").str.to_datetime("%Y-%m-%dT%H:%M:%S+00:00")
+        if ctx.triggered_id != {"page": "map", "component": "map"}:
+            # Figures of the whole selection are cached for the same inputs
+            # and dataset version
+            return create_full_tracks_map(
+                version, sport_types, start_date, stop_date, map_layer
             )
-            .filter(
-                (pl.col("sport_type").is_in(sport_types))
-                & (pl.col("start_date_local").is_between(start_date, stop_date))
-            )
-        )
 
-        return create_map(
-            polyline_str=[
-                a["summary_polyline"] for a in df.get_column("map").to_list()
+        # Only select activities visible in the viewport after the map was
+        # moved
+        if relayout_data is None or "map._derived" not in relayout_data:
+            raise PreventUpdate
+        dataset = STORE.get(version)
+        lons, lats = zip(*relayout_data["map._derived"]["coordinates"])
+        return create_tracks_map(
+            dataset.df[
+                dataset.spatial_index.query(min(lats), min(lons), max(lats), max(lons))
             ],
-            name=df["name"].to_list(),
-            color=[SPORT_TYPE_COLORS.get(st, "#FFA800") for st in df["sport_type"]],
-            map_layer=map_layer,
+            sport_types,
+            start_date,
+            stop_date,
+            map_layer,
+            zoom=relayout_data.get("map.zoom"),
         )
+
+    clientside_callback(
+        EXPAND_TRACK_NAMES,
+        Output({"page": "map", "component": "map"}, "figure"),
+        Input({"page": "map", "component": "map-store"}, "data"),
+    )  # Display the map with the names of the activities on hover
@@ -14,7 +14,10 @@ register_callbacks()
 
 layout = dmc.Container(
     dmc.Card(
-        dcc.Graph(id={"page": "map", "component": "map"}, style={"height": "80vh"})
+        [
+            dcc.Store(id={"page": "map", "component": "map-store"}),
+            dcc.Graph(id={"page": "map", "component": "map"}, style={"height": "80vh"}),
+        ]
     ),
     fluid=True,
 )
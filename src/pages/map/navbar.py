@@ -37,5 +37,19 @@ def MapNavbar():
                 leftSection=DashIconify(icon="ic:baseline-calendar-month"),
             ),
             PlotlyMapLayerSelect({"page": "map", "component": "map-layer-select"}),
+            dmc.SegmentedControl(
+                id={"page": "map", "component": "map-mode-control"},
+                data=[
+                    {"value": "tracks", "label": "Tracks"},
+                    {"value": "heatmap", "label": "Heatmap"},
+                ],
+                value="tracks",
+                size="sm",
+                radius="md",
+                orientation="horizontal",
+                fullWidth=True,
+                transitionDuration=100,
+                transitionTimingFunction="linear",
+            ),
         ]
     )
@@ -0,0 +1,92 @@
+"""
+This module contains the in-memory cache of the figures built by the
+callbacks.
+"""
+
+import functools
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from plotly.io.json import to_json_plotly
+
+# Maximum size of the figure cache in memory (in bytes of JSON)
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE_MB", "64")) * 1024 * 1024
+
+
+def _normalize(value):
+    """
+    Normalise a callback input so that equivalent inputs share the same
+    cache key (multi-select values do not depend on the selection order).
+    """
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(item) for item in value]
+        if all(isinstance(item, str) for item in items):
+            return sorted(items)
+        return items
+    return value
+
+
+class FigureCache:
+    """
+    LRU cache of callback outputs (figures or components) bounded by the
+    size of their JSON. Outputs are stored as JSON strings (so that the
+    size bound is the memory actually used) and parsed again on cache
+    hits.
+
+    Args:
+        max_size (int, optional): Maximum size of the cache (in bytes).
+            Defaults to FIGURE_CACHE_SIZE.
+    """
+
+    def __init__(self, max_size: int = FIGURE_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def memoize(self, func):
+        """
+        Decorate a function building callback outputs. Its arguments must
+        be JSON serialisable and include the version of the dataset it
+        reads.
+
+        Args:
+            func (Callable): Function to memoise.
+
+        Returns:
+            Callable: Memoised function.
+        """
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = json.dumps(
+                [func.__module__, func.__qualname__, _normalize(args)], default=str
+            )
+            with self._lock:
+                serialized = self._entries.get(key)
+                if serialized is not None:
+                    self._entries.move_to_end(key)
+            if serialized is not None:
+                return json.loads(serialized)
+
+            serialized = to_json_plotly(func(*args))
+
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = serialized
+                    self.size += len(serialized)
+                    self._evict()
+            return json.loads(serialized)
+
+        return wrapper
+
+    def _evict(self):
+        # Remove least recently used outputs until the cache fits in max_size
+        while self.size > self.max_size and len(self._entries) > 1:
+            _, serialized = self._entries.popitem(last=False)
+            self.size -= len(serialized)
+
+
+FIGURE_CACHE = FigureCache()
@@ -0,0 +1,101 @@
+"""
+This module contains the rollup tables of the activities dataset.
+"""
+
+from dataclasses import dataclass
+
+import polars as pl
+
+# Truncation interval of each rollup period
+PERIODS = {
+    "daily": "1d",
+    "weekly": "1w",  # Weeks start on Monday
+    "monthly": "1mo",
+}
+
+
+def _period_date(every: str) -> pl.Expr:
+    return pl.col("start_date_local").dt.truncate(every).dt.date().alias("date")
+
+
+def compute_rollup(df: pl.DataFrame, every: str) -> pl.DataFrame:
+    """
+    Aggregate activities by period and sport type.
+
+    Args:
+        df (pl.DataFrame): Activities dataframe.
+        every (str): Truncation interval of the period (e.g.: "1w").
+
+    Returns:
+        pl.DataFrame: Rollup dataframe with one row per (date, type,
+            sport_type), date being the first day of the period.
+    """
+    return (
+        df.group_by(_period_date(every), "type", "sport_type")
+        .agg(
+            pl.col("distance").sum(),
+            pl.col("elapsed_time").sum(),
+            pl.col("total_elevation_gain").sum(),
+            pl.len().alias("count"),
+        )
+        .sort("date")
+    )
+
+
+@dataclass(frozen=True)
+class Rollups:
+    """
+    Daily, weekly and monthly rollups of the activities dataset.
+
+    Args:
+        daily (pl.DataFrame): Daily rollup.
+        weekly (pl.DataFrame): Weekly rollup.
+        monthly (pl.DataFrame): Monthly rollup.
+    """
+
+    daily: pl.DataFrame
+    weekly: pl.DataFrame
+    monthly: pl.DataFrame
+
+    @classmethod
+    def build(cls, df: pl.DataFrame) -> "Rollups":
+        """
+        Compute rollups from scratch.
+
+        Args:
+            df (pl.DataFrame): Activities dataframe.
+
+        Returns:
+            Rollups: Rollups of the activities dataframe.
+        """
+        return cls(
+            **{period: compute_rollup(df, every) for period, every in PERIODS.items()}
+        )
+
+    def update(self, df: pl.DataFrame, changed: pl.DataFrame) -> "Rollups":
+        """
+        Update rollups after a synchronisation. Only the periods
+        containing changed activities are aggregated again.
+
+        Args:
+            df (pl.DataFrame): Activities dataframe (after
+                synchronisation).
+            changed (pl.DataFrame): Activities added, edited or deleted
+                by the synchronisation.
+
+        Returns:
+            Rollups: Updated rollups.
+        """
+        rollups = {}
+        for period, every in PERIODS.items():
+            dates = changed.select(_period_date(every).unique()).to_series().implode()
+            rollups[period] = pl.concat(
+                [
+                    getattr(self, period).filter(~pl.col("date").is_in(dates)),
+                    compute_rollup(
+                        df.filter(_period_date(every).is_in(dates)),
+                        every,
+                    ),
+                ]
+            ).sort("date")
+        return Rollups(**rollups)
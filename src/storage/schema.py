@@ -0,0 +1,101 @@
+"""
+This module contains the schema of the activities dataset.
+"""
+
+import polars as pl
+
+# Bump when ACTIVITY_SCHEMA changes: stores written with another schema
+# version are ignored and rebuilt from Strava
+SCHEMA_VERSION = 1
+
+MAP_SCHEMA = pl.Struct({"id": pl.String, "summary_polyline": pl.String})
+
+ACTIVITY_SCHEMA = pl.Schema(
+    {
+        # General
+        "id": pl.Int64,
+        "name": pl.String,
+        "type": pl.Categorical(),
+        "sport_type": pl.Categorical(),
+        "workout_type": pl.Int16,
+        "trainer": pl.Boolean,
+        "commute": pl.Boolean,
+        # Time
+        "start_date": pl.Datetime("us", "UTC"),
+        "start_date_local": pl.Datetime("us"),
+        "timezone": pl.String,
+        "utc_offset": pl.Float32,
+        # Performance
+        "distance": pl.Float32,
+        "total_elevation_gain": pl.Float32,
+        "elapsed_time": pl.Int32,
+        "moving_time": pl.Int32,
+        "average_speed": pl.Float32,
+        "max_speed": pl.Float32,
+        "average_cadence": pl.Float32,
+        "average_heartrate": pl.Float32,
+        "max_heartrate": pl.Float32,
+        "average_watts": pl.Float32,
+        "weighted_average_watts": pl.Float32,
+        "max_watts": pl.Float32,
+        "device_watts": pl.Boolean,
+        "kilojoules": pl.Float32,
+        "suffer_score": pl.Int32,
+        # Gear
+        "gear_id": pl.String,
+        # Location
+        "location_city": pl.String,
+        "location_state": pl.String,
+        "location_country": pl.String,
+        "start_latlng": pl.List(pl.Float64),
+        "end_latlng": pl.List(pl.Float64),
+        "elev_low": pl.Float32,
+        "elev_high": pl.Float32,
+        "map": MAP_SCHEMA,
+        # Strava
+        "private": pl.Boolean,
+        "visibility": pl.Categorical(),
+        "athlete_count": pl.Int32,
+        "kudos_count": pl.Int32,
+        "comment_count": pl.Int32,
+        "achievement_count": pl.Int32,
+        "pr_count": pl.Int32,
+        "photo_count": pl.Int32,
+        "total_photo_count": pl.Int32,
+        # Synchronisation
+        "content_hash": pl.UInt64,
+    }
+)
+
+
+def parse_activities(records: list[dict]) -> pl.DataFrame:
+    """
+    Parse activity records into a dataframe following ACTIVITY_SCHEMA.
+
+    Fields missing from the schema are dropped, dates are parsed and
+    local start dates are converted to naive (wall clock) datetimes.
+
+    Args:
+        records (list[dict]): Activity records (as returned by
+            `activities_to_records`).
+
+    Returns:
+        pl.DataFrame: Activities dataframe.
+    """
+    raw_schema = {
+        name: pl.String if isinstance(dtype, (pl.Categorical, pl.Datetime)) else dtype
+        for name, dtype in ACTIVITY_SCHEMA.items()
+    }
+    return (
+        pl.DataFrame(records, schema=raw_schema, strict=False)
+        .with_columns(
+            pl.col("start_date").str.to_datetime(
+                "%Y-%m-%dT%H:%M:%S%z", time_zone="UTC"
+            ),
+            # Strava local dates carry a meaningless UTC offset
+            pl.col("start_date_local")
+            .str.to_datetime("%Y-%m-%dT%H:%M:%S%z")
+            .dt.replace_time_zone(None),
+        )
+        .cast(ACTIVITY_SCHEMA)
+    )
@@ -0,0 +1,116 @@
+"""
+This module contains the spatial index of the activities dataset.
+"""
+
+import numpy as np
+
+from utils.tracks import decode_polyline
+
+# Size of the grid cells (in degrees, ~25 km)
+CELL_SIZE = 0.25
+
+# Activities covering more cells are not indexed and always checked
+MAX_CELLS = 1024
+
+
+class SpatialIndex:
+    """
+    Grid index over the bounding boxes of activity tracks.
+
+    Args:
+        bboxes (np.ndarray): Bounding box of each activity (one row of
+            min latitude, min longitude, max latitude and max longitude
+            per activity, NaN for activities without track).
+        cell_size (float, optional): Size of the grid cells (in
+            degrees). Defaults to CELL_SIZE.
+    """
+
+    def __init__(self, bboxes: np.ndarray, cell_size: float = CELL_SIZE):
+        self.bboxes = bboxes
+        self.cell_size = cell_size
+        self._rows = np.flatnonzero(~np.isnan(bboxes[:, 0]))
+
+        cells = {}
+        large = []
+        bounds = np.floor(bboxes[self._rows] / cell_size).astype(np.int64)
+        for row, (i0, j0, i1, j1) in zip(self._rows, bounds):
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > MAX_CELLS:
+                large.append(row)
+                continue
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    cells.setdefault((i, j), []).append(row)
+        self._cells = {cell: np.array(rows) for cell, rows in cells.items()}
+        self._large = np.array(large, dtype=np.int64)
+
+    @classmethod
+    def from_polylines(cls, polyline_strs: list) -> "SpatialIndex":
+        """
+        Build the index from activity polylines.
+
+        Args:
+            polyline_strs (list): Polyline string of each activity.
+
+        Returns:
+            SpatialIndex: Spatial index (rows follow the polylines).
+        """
+        bboxes = np.full((len(polyline_strs), 4), np.nan)
+        for row, polyline_str in enumerate(polyline_strs):
+            # Bounds are computed once when the track is decoded
+            coords = decode_polyline(polyline_str).coords
+            if coords is not None:
+                bboxes[row] = (
+                    coords["min_lat"],
+                    coords["min_lon"],
+                    coords["max_lat"],
+                    coords["max_lon"],
+                )
+        return cls(bboxes)
+
+    def query(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> np.ndarray:
+        """
+        Return the activities intersecting a bounding box.
+
+        Args:
+            min_lat (float): Minimum latitude.
+            min_lon (float): Minimum longitude.
+            max_lat (float): Maximum latitude.
+            max_lon (float): Maximum longitude.
+
+        Returns:
+            np.ndarray: Sorted rows of the activities.
+        """
+        i0, j0 = (
+            int(np.floor(min_lat / self.cell_size)),
+            int(np.floor(min_lon / self.cell_size)),
+        )
+        i1, j1 = (
+            int(np.floor(max_lat / self.cell_size)),
+            int(np.floor(max_lon / self.cell_size)),
+        )
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            # Checking every activity is cheaper than visiting every cell
+            candidates = self._rows
+        else:
+            candidates = np.unique(
+                np.concatenate(
+                    [
+                        self._cells[(i, j)]
+                        for i in range(i0, i1 + 1)
+                        for j in range(j0, j1 + 1)
+                        if (i, j) in self._cells
+                    ]
+                    + [self._large]
+                )
+            ).astype(np.int64)
+
+        bboxes = self.bboxes[candidates]
+        hits = (
+            (bboxes[:, 0] <= max_lat)
+            & (bboxes[:, 2] >= min_lat)
+            & (bboxes[:, 1] <= max_lon)
+            & (bboxes[:, 3] >= min_lon)
+        )
+        return np.sort(candidates[hits])
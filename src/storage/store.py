@@ -0,0 +1,307 @@
+"""
+This module contains the local activity store.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+
+import polars as pl
+from plotly.utils import PlotlyJSONEncoder
+
+from storage.rollups import Rollups
+from storage.schema import ACTIVITY_SCHEMA, SCHEMA_VERSION
+from storage.spatial import SpatialIndex
+
+DATA_DIR = Path(os.getenv("DATA_DIR", "data"))
+
+# Number of dataset versions kept in memory for clients holding old versions
+MAX_DATASETS = 4
+
+
+def to_json_records(obj):
+    """
+    Convert Python objects (e.g.: Strava models dumps) to JSON records.
+
+    The records are serialised the same way Dash serialises callback
+    outputs so that pages keep reading the data they already expect.
+
+    Args:
+        obj (Any): Object to convert.
+
+    Returns:
+        Any: JSON compatible object.
+    """
+    return json.loads(json.dumps(obj, cls=PlotlyJSONEncoder))
+
+
+def activities_to_records(activities) -> list[dict]:
+    """
+    Convert Strava activities to JSON records.
+
+    Args:
+        activities (Iterable): Strava activities.
+
+    Returns:
+        list[dict]: List of activity records.
+    """
+    return to_json_records([activity.model_dump() for activity in activities])
+
+
+def _year() -> pl.Expr:
+    return pl.col("start_date_local").dt.year()
+
+
+def partition_years(df: pl.DataFrame) -> set[int]:
+    """
+    Return the years of the partitions containing the given activities.
+
+    Args:
+        df (pl.DataFrame): Activities dataframe.
+
+    Returns:
+        set[int]: Partition years.
+    """
+    if df.is_empty():
+        return set()
+    return set(df.select(_year().unique()).to_series().to_list())
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Published version of the activities dataset.
+
+    Args:
+        version (int): Dataset version.
+        df (pl.DataFrame): Activities dataframe.
+        rollups (Rollups, optional): Rollups of the activities
+            dataframe. Defaults to None (computed from scratch).
+    """
+
+    version: int
+    df: pl.DataFrame
+    rollups: Rollups = field(default=None, repr=False)
+    index: dict[int, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.rollups is None:
+            object.__setattr__(self, "rollups", Rollups.build(self.df))
+        # Map activity IDs to row numbers
+        object.__setattr__(
+            self,
+            "index",
+            {activity_id: row for row, activity_id in enumerate(self.df["id"])},
+        )
+
+    def activity(self, activity_id: int) -> dict | None:
+        """
+        Return an activity in constant time.
+
+        Args:
+            activity_id (int): Activity ID.
+
+        Returns:
+            dict | None: Activity record (typed as in ACTIVITY_SCHEMA) or
+                None if the activity does not exist.
+        """
+        row = self.index.get(activity_id)
+        if row is None:
+            return None
+        return self.df.row(row, named=True)
+
+    @cached_property
+    def spatial_index(self) -> SpatialIndex:
+        """
+        Spatial index of the activity tracks (built on first access).
+        """
+        return SpatialIndex.from_polylines(
+            self.df.get_column("map").struct.field("summary_polyline").to_list()
+        )
+
+
+class ActivityStore:
+    """
+    Local activity store backed by year-partitioned Parquet files.
+
+    Args:
+        path (Path): Directory containing the Parquet partitions.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._datasets = OrderedDict()
+        self._version = 0
+
+    def _partition_path(self, year: int) -> Path:
+        return self.path / f"activities_{year}.parquet"
+
+    def _partition_years(self) -> set[int]:
+        return {
+            int(p.stem.split("_")[-1]) for p in self.path.glob("activities_*.parquet")
+        }
+
+    def load(self) -> pl.DataFrame:
+        """
+        Read all partitions from disk.
+
+        Returns:
+            pl.DataFrame: Activities dataframe sorted by start date.
+        """
+        frames = [
+            pl.read_parquet(self._partition_path(year))
+            for year in sorted(self._partition_years())
+        ]
+        if not frames:
+            return pl.DataFrame(schema=ACTIVITY_SCHEMA)
+        return pl.concat(frames).sort("start_date")
+
+    def snapshot(self) -> Dataset:
+        """
+        Return the latest published dataset (read from disk on first
+        access).
+
+        Returns:
+            Dataset: Latest dataset.
+        """
+        with self._lock:
+            if not self._datasets:
+                self._publish(self.load())
+            return next(reversed(self._datasets.values()))
+
+    def get(self, version: int | None) -> Dataset:
+        """
+        Return a published dataset.
+
+        Args:
+            version (int | None): Dataset version.
+
+        Returns:
+            Dataset: Dataset with the given version or latest dataset if
+                this version is no longer available.
+        """
+        latest = self.snapshot()
+        with self._lock:
+            return self._datasets.get(version, latest)
+
+    @property
+    def dataframe(self) -> pl.DataFrame:
+        """
+        Latest activities dataframe.
+        """
+        return self.snapshot().df
+
+    @property
+    def version(self) -> int:
+        """
+        Latest dataset version.
+        """
+        return self.snapshot().version
+
+    def _publish(self, df: pl.DataFrame, changed: pl.DataFrame | None = None):
+        # Publish the whole dataset at once so readers never mix versions
+        rollups = None
+        if self._datasets and changed is not None:
+            latest = next(reversed(self._datasets.values()))
+            rollups = latest.rollups.update(df, changed)
+        self._version += 1
+        self._datasets[self._version] = Dataset(self._version, df.rechunk(), rollups)
+        while len(self._datasets) > MAX_DATASETS:
+            self._datasets.popitem(last=False)
+
+    def write(
+        self,
+        df: pl.DataFrame,
+        years: set[int] | None = None,
+        changed: pl.DataFrame | None = None,
+    ):
+        """
+        Write activities to disk (one Parquet file per year of
+        `start_date_local`).
+
+        Args:
+            df (pl.DataFrame): Full activities dataframe.
+            years (set[int] | None, optional): Years to write. Other
+                partitions are assumed unchanged. Defaults to None (all
+                years).
+            changed (pl.DataFrame | None, optional): Activities changed
+                since the latest published dataset, used to update
+                rollups incrementally. Defaults to None (rollups are
+                computed from scratch).
+        """
+        df = df.sort("start_date")
+        partitions = {}
+        if not df.is_empty():
+            partitions = {
+                key[0]: partition
+                for key, partition in df.with_columns(_year().alias("_year"))
+                .partition_by("_year", as_dict=True, include_key=False)
+                .items()
+            }
+        if years is None:
+            years = set(partitions) | self._partition_years()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for year in years:
+                path = self._partition_path(year)
+                if year in partitions:
+                    # Write to a temporary file first so readers never see
+                    # a partially written partition
+                    tmp_path = path.with_suffix(".parquet.tmp")
+                    partitions[year].write_parquet(tmp_path)
+                    os.replace(tmp_path, path)
+                elif path.exists():
+                    path.unlink()
+            self._publish(df, changed)
+
+
+class AthleteStore:
+    """
+    Local athlete store backed by a JSON file.
+
+    Args:
+        path (Path): Path of the JSON file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        """
+        Latest athlete data (read from disk on first access).
+        """
+        with self._lock:
+            if self._data is None:
+                self._data = {}
+                if self.path.exists():
+                    with open(self.path, encoding="utf-8") as f:
+                        self._data = json.load(f)
+            return self._data
+
+    def write(self, data: dict):
+        """
+        Write athlete data to disk.
+
+        Args:
+            data (dict): Athlete data.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            tmp_path = self.path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._data = data
+
+
+STORE = ActivityStore(DATA_DIR / f"activities_v{SCHEMA_VERSION}")
+ATHLETE_STORE = AthleteStore(DATA_DIR / "athlete.json")
@@ -0,0 +1,130 @@
+"""
+This module contains the local cache of activity streams.
+"""
+
+import os
+import threading
+from pathlib import Path
+
+import polars as pl
+
+from storage.store import DATA_DIR
+from strava.client import CLIENT
+
+STREAM_TYPES = [
+    "time",
+    "latlng",
+    "distance",
+    "altitude",
+    "velocity_smooth",
+    "heartrate",
+    "cadence",
+    "watts",
+    "grade_smooth",
+]
+
+STREAM_SCHEMA = {
+    "time": pl.Int32,
+    "lat": pl.Float64,
+    "lng": pl.Float64,
+    "distance": pl.Float32,
+    "altitude": pl.Float32,
+    "velocity_smooth": pl.Float32,
+    "heartrate": pl.Float32,
+    "cadence": pl.Float32,
+    "watts": pl.Float32,
+    "grade_smooth": pl.Float32,
+}
+
+# Maximum size of the stream cache on disk (in bytes)
+STREAM_CACHE_SIZE = int(os.getenv("STREAM_CACHE_SIZE_MB", "256")) * 1024 * 1024
+
+
+def fetch_streams(activity_id: int) -> pl.DataFrame:
+    """
+    Fetch the streams of an activity from Strava.
+
+    Args:
+        activity_id (int): Activity ID.
+
+    Returns:
+        pl.DataFrame: Streams dataframe (one column per stream, missing
+            streams are filled with nulls).
+    """
+    streams = CLIENT.get_activity_streams(activity_id, STREAM_TYPES)
+    columns = {}
+    for stream_type, stream in streams.items():
+        if stream_type == "latlng":
+            columns["lat"] = [point[0] for point in stream.data]
+            columns["lng"] = [point[1] for point in stream.data]
+        elif stream_type in STREAM_SCHEMA:
+            columns[stream_type] = stream.data
+    return pl.DataFrame(columns).select(
+        (
+            pl.col(name).cast(dtype)
+            if name in columns
+            else pl.lit(None, dtype).alias(name)
+        )
+        for name, dtype in STREAM_SCHEMA.items()
+    )
+
+
+class StreamCache:
+    """
+    Disk-backed LRU cache of activity streams (one Parquet file per
+    activity).
+
+    Args:
+        path (Path): Directory containing the cached streams.
+        max_size (int, optional): Maximum size of the cache (in bytes).
+            Defaults to STREAM_CACHE_SIZE.
+    """
+
+    def __init__(self, path: Path, max_size: int = STREAM_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def _path(self, activity_id: int) -> Path:
+        return self.path / f"{activity_id}.parquet"
+
+    def get(self, activity_id: int) -> pl.DataFrame:
+        """
+        Return the streams of an activity, fetching them from Strava on
+        cache miss.
+
+        Args:
+            activity_id (int): Activity ID.
+
+        Returns:
+            pl.DataFrame: Streams dataframe.
+        """
+        path = self._path(activity_id)
+        with self._lock:
+            if path.exists():
+                os.utime(path)  # Mark as most recently used
+                return pl.read_parquet(path)
+
+        df = fetch_streams(activity_id)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            tmp_path = path.with_suffix(".parquet.tmp")
+            df.write_parquet(tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+            self._evict()
+        return df
+
+    def _evict(self):
+        # Remove least recently used files until the cache fits in max_size
+        files = sorted(
+            self.path.glob("*.parquet"), key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        size = 0
+        for file in files:
+            size += file.stat().st_size
+            if size > self.max_size and file != files[0]:
+                file.unlink()
+
+
+STREAM_CACHE = StreamCache(DATA_DIR / "streams")
@@ -0,0 +1,333 @@
+"""
+This module contains the synchronisation of the local store with Strava.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import polars as pl
+
+from storage.schema import parse_activities
+from storage.store import (
+    ATHLETE_STORE,
+    STORE,
+    ActivityStore,
+    AthleteStore,
+    activities_to_records,
+    partition_years,
+    to_json_records,
+)
+from storage.tiles import TILE_CACHE
+from strava.client import CLIENT
+
+# History fetched when the local store is empty
+INITIAL_HISTORY = datetime.timedelta(weeks=10)
+
+# Activities started less than LOOKBACK before the watermark are fetched again
+# on every sync so that recent edits and deletions are picked up
+LOOKBACK = datetime.timedelta(days=int(os.getenv("SYNC_LOOKBACK_DAYS", "7")))
+
+# Number of activities requested at once when loading history
+HISTORY_PAGE_SIZE = 200
+
+# Maximum number of pages requested by one history loading (the rest of the
+# interval is loaded by the next calls)
+HISTORY_MAX_PAGES = 5
+
+_SYNC_LOCK = threading.Lock()
+
+
+def _content_hash(record: dict) -> int:
+    """
+    Compute a stable 64 bits hash of an activity record.
+    """
+    digest = hashlib.blake2b(
+        json.dumps(record, sort_keys=True).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _read_state(store: ActivityStore) -> dict:
+    path = store.path / "sync_state.json"
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_state(store: ActivityStore, state: dict):
+    path = store.path / "sync_state.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _read_coverage(state: dict, store: ActivityStore) -> list:
+    """
+    Return the time intervals already loaded from Strava (sorted list of
+    [start, stop] datetimes).
+    """
+    if "coverage" in state:
+        coverage = []
+        for start, stop in state["coverage"]:
+            coverage = _add_interval(
+                coverage,
+                datetime.datetime.fromisoformat(start),
+                datetime.datetime.fromisoformat(stop),
+            )
+        return coverage
+    if state.get("watermark") is None or store.dataframe.is_empty():
+        return []
+    # Stores synchronised before coverage was recorded hold everything after
+    # their first activity
+    return [
+        [
+            store.dataframe.get_column("start_date").min(),
+            datetime.datetime.fromisoformat(state["watermark"]),
+        ]
+    ]
+
+
+def _add_interval(coverage: list, start: datetime.datetime, stop: datetime.datetime):
+    """
+    Add an interval to a coverage (merging overlapping intervals). Empty
+    and inverted intervals are ignored.
+    """
+    if start >= stop:
+        return [list(interval) for interval in coverage]
+    merged = []
+    for interval in sorted(coverage + [[start, stop]]):
+        if merged and interval[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], interval[1])
+        else:
+            merged.append(list(interval))
+    return merged
+
+
+def _missing_intervals(
+    coverage: list, start: datetime.datetime, stop: datetime.datetime
+) -> list:
+    """
+    Return the parts of an interval missing from a coverage (none if the
+    interval is empty or inverted).
+    """
+    if start >= stop:
+        return []
+    missing = []
+    for covered_start, covered_stop in coverage:
+        if covered_start > start:
+            missing.append([start, min(covered_start, stop)])
+        start = max(start, covered_stop)
+        if start >= stop:
+            return missing
+    return missing + [[start, stop]]
+
+
+def _state_coverage(coverage: list) -> list:
+    return [[start.isoformat(), stop.isoformat()] for start, stop in coverage]
+
+
+def _merge(store: ActivityStore, records: list, window: pl.Expr) -> pl.DataFrame:
+    """
+    Merge fetched activity records into the store by ID and content hash.
+    Stored activities of the fetched window missing from the records are
+    deleted.
+    """
+    # Pages of overlapping requests can contain the same activity twice
+    fetched = parse_activities(
+        [record | {"content_hash": _content_hash(record)} for record in records]
+    ).unique("id", keep="last", maintain_order=True)
+
+    df = store.dataframe
+    window = df.filter(window)
+
+    # Compare the fetched window with the stored one
+    new_rows = fetched.join(
+        window.select("id", "content_hash"), on=["id", "content_hash"], how="anti"
+    )
+    old_rows = window.join(
+        fetched.select("id", "content_hash"), on=["id", "content_hash"], how="anti"
+    )
+    changed_ids = pl.concat([new_rows.get_column("id"), old_rows.get_column("id")])
+    old_rows = df.filter(pl.col("id").is_in(changed_ids.implode()))
+    changed = pl.concat([old_rows, new_rows])
+
+    if not changed.is_empty():
+        print(f"Merging {changed_ids.n_unique()} changed activities...")
+        df = pl.concat(
+            [df.filter(~pl.col("id").is_in(changed_ids.implode())), new_rows]
+        )
+        store.write(df, years=partition_years(changed), changed=changed)
+        if store is TILE_CACHE.store:
+            # Old and new versions of an activity share the same ID and
+            # polyline when only its other fields changed
+            polyline = pl.col("map").struct.field("summary_polyline")
+            TILE_CACHE.invalidate(
+                changed.filter(pl.struct(pl.col("id"), polyline).is_unique())
+            )
+    return changed
+
+
+def sync_activities(store: ActivityStore = STORE) -> pl.DataFrame:
+    """
+    Synchronise the local store with Strava.
+
+    Only activities started after the high-water mark (minus a lookback
+    window) are requested. They are merged into the store by ID and
+    content hash: new and edited activities are upserted and
+    activities missing from the lookback window are deleted.
+
+    Args:
+        store (ActivityStore, optional): Activity store. Defaults to
+            STORE.
+
+    Returns:
+        pl.DataFrame: Activities added, edited or deleted by the
+            synchronisation (both old and new versions of edited
+            activities).
+    """
+    with _SYNC_LOCK:
+        state = _read_state(store)
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        if state.get("watermark") is None:
+            after = now - INITIAL_HISTORY
+        else:
+            after = datetime.datetime.fromisoformat(state["watermark"]) - LOOKBACK
+
+        coverage = _read_coverage(state, store)
+
+        print(f"Synchronising activities after {after.isoformat()}...")
+        records = activities_to_records(CLIENT.get_activities(after=after))
+        changed = _merge(store, records, pl.col("start_date") > after)
+
+        watermark = (
+            store.dataframe.get_column("start_date").max()
+            if not store.dataframe.is_empty()
+            else now
+        )
+        _write_state(
+            store,
+            state
+            | {
+                "watermark": watermark.isoformat(),
+                "coverage": _state_coverage(_add_interval(coverage, after, now)),
+            },
+        )
+
+        return changed
+
+
+def load_history(
+    start: datetime.datetime,
+    stop: datetime.datetime,
+    store: ActivityStore = STORE,
+    page_size: int = HISTORY_PAGE_SIZE,
+    max_pages: int = HISTORY_MAX_PAGES,
+) -> pl.DataFrame | None:
+    """
+    Load the activities of a time interval from Strava. Only the parts of
+    the interval missing from the coverage recorded in the
+    synchronisation state are requested (in pages of page_size
+    activities) and merged into the store, so that loaded intervals are
+    never fetched twice. At most max_pages pages are requested so that
+    callers are not blocked for long: the loaded parts are recorded and
+    the rest of the interval is loaded by the next calls.
+
+    Args:
+        start (datetime.datetime): Start of the interval (UTC).
+        stop (datetime.datetime): End of the interval (UTC, clipped to the
+            current time).
+        store (ActivityStore, optional): Activity store. Defaults to
+            STORE.
+        page_size (int, optional): Number of activities requested at
+            once. Defaults to HISTORY_PAGE_SIZE.
+        max_pages (int, optional): Maximum number of pages requested.
+            Defaults to HISTORY_MAX_PAGES.
+
+    Returns:
+        pl.DataFrame: Activities added, edited or deleted by the loading
+            (None if the interval was already loaded).
+    """
+    with _SYNC_LOCK:
+        state = _read_state(store)
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        coverage = _read_coverage(state, store)
+        missing = _missing_intervals(coverage, start, min(stop, now))
+        if not missing:
+            return None
+
+        records, window, pages = [], pl.lit(False), 0
+        for gap_start, gap_stop in missing:
+            if pages >= max_pages:
+                break
+            print(
+                f"Loading activities between {gap_start.isoformat()} "
+                f"and {gap_stop.isoformat()}..."
+            )
+            after, before, complete = gap_start, gap_stop, False
+            while pages < max_pages:
+                page = activities_to_records(
+                    CLIENT.get_activities(after=after, before=before, limit=page_size)
+                )
+                pages += 1
+                records += page
+                if len(page) < page_size:
+                    complete = True
+                    break
+                # Continue after the last activity of the page (pages are
+                # sorted in either direction)
+                start_dates = [
+                    datetime.datetime.fromisoformat(page[i]["start_date"])
+                    for i in (0, -1)
+                ]
+                if start_dates[0] <= start_dates[1]:
+                    after = start_dates[1]
+                else:
+                    before = start_dates[1]
+
+            if complete:
+                coverage = _add_interval(coverage, gap_start, gap_stop)
+                window |= pl.col("start_date").is_between(
+                    gap_start, gap_stop, closed="none"
+                )
+                continue
+            # Only record the loaded parts of the interval
+            if after > gap_start:
+                coverage = _add_interval(coverage, gap_start, after)
+                window |= pl.col("start_date").is_between(
+                    gap_start, after, closed="right"
+                )
+            if before < gap_stop:
+                coverage = _add_interval(coverage, before, gap_stop)
+                window |= pl.col("start_date").is_between(
+                    before, gap_stop, closed="left"
+                )
+
+        changed = _merge(store, records, window)
+        _write_state(store, state | {"coverage": _state_coverage(coverage)})
+
+        return changed
+
+
+def sync_athlete(store: AthleteStore = ATHLETE_STORE) -> dict:
+    """
+    Synchronise the local athlete data with Strava.
+
+    Args:
+        store (AthleteStore, optional): Athlete store. Defaults to
+            ATHLETE_STORE.
+
+    Returns:
+        dict: Athlete data.
+    """
+    print("Synchronising athlete...")
+    athlete = CLIENT.get_athlete()
+    data = to_json_records(athlete.model_dump() | athlete.stats.model_dump())
+    if data != store.data:
+        store.write(data)
+    return data
@@ -0,0 +1,162 @@
+"""
+This module contains the route thumbnails of the activities.
+"""
+
+import hashlib
+import math
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from constants.colors import SPORT_TYPE_COLORS
+from storage.store import DATA_DIR
+from utils.tracks import decode_polyline, simplify_polyline
+
+# Size of the thumbnails (in pixels)
+THUMBNAIL_WIDTH = 320
+THUMBNAIL_HEIGHT = 200
+THUMBNAIL_PADDING = 10
+
+# Maximum size of the thumbnail cache on disk (in bytes)
+THUMBNAIL_CACHE_SIZE = int(os.getenv("THUMBNAIL_CACHE_SIZE_MB", "64")) * 1024 * 1024
+
+
+def render_thumbnail(polyline_str: str | None, color: str = "#FFA800") -> str:
+    """
+    Render the route of an activity to an SVG image. The route is
+    simplified to the thumbnail resolution and projected with the Web
+    Mercator projection.
+
+    Args:
+        polyline_str (str | None): Polyline string of the route.
+        color (str, optional): Color of the route. Defaults to "#FFA800".
+
+    Returns:
+        str: SVG image (empty for activities without route).
+    """
+    width, height = THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT
+    header = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width}" height="{height}">'
+    )
+    points = ""
+    track = decode_polyline(polyline_str)
+    if len(track) > 0:
+        # Simplify to the thumbnail resolution
+        span = max(np.ptp(track.lat), np.ptp(track.lon), 1e-6)
+        level = math.ceil(math.log2(360 * width / (512 * span)))
+        track = simplify_polyline(polyline_str, max(level, 0))
+
+        x = np.radians(track.lon)
+        y = -np.log(np.tan(np.pi / 4 + np.radians(track.lat) / 2))
+        x, y = x - x.min(), y - y.min()
+        scale = min(
+            (width - 2 * THUMBNAIL_PADDING) / max(x.max(), 1e-9),
+            (height - 2 * THUMBNAIL_PADDING) / max(y.max(), 1e-9),
+        )
+        # Center the route
+        x = x * scale + (width - x.max() * scale) / 2
+        y = y * scale + (height - y.max() * scale) / 2
+        points = " ".join(f"{px:.1f},{py:.1f}" for px, py in zip(x, y))
+    return (
+        header
+        + f'<polyline points="{points}" fill="none" stroke="{color}" '
+        + 'stroke-width="3" stroke-linejoin="round" stroke-linecap="round"/>'
+        + "</svg>"
+    )
+
+
+def thumbnail_hash(activity: dict) -> int:
+    """
+    Compute a stable 64 bits hash of what the thumbnail of an activity
+    draws (route and sport type), so that thumbnails only change with
+    them.
+
+    Args:
+        activity (dict): Activity record.
+
+    Returns:
+        int: Thumbnail hash.
+    """
+    inputs = f"{activity['map']['summary_polyline']}|{activity['sport_type']}"
+    digest = hashlib.blake2b(inputs.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class ThumbnailCache:
+    """
+    Disk-backed LRU cache of the activity thumbnails. Thumbnails are
+    named after the activity ID and thumbnail hash so that activities
+    with a new route or sport type get new thumbnails.
+
+    Args:
+        path (Path): Directory containing the cached thumbnails.
+        max_size (int, optional): Maximum size of the cache (in bytes).
+            Defaults to THUMBNAIL_CACHE_SIZE.
+    """
+
+    def __init__(self, path: Path, max_size: int = THUMBNAIL_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self._size = None  # Size of the cached thumbnails (computed on first write)
+        self._lock = threading.Lock()
+
+    def get(self, activity: dict) -> bytes:
+        """
+        Return the thumbnail of an activity, rendering it on cache miss.
+
+        Args:
+            activity (dict): Activity record.
+
+        Returns:
+            bytes: SVG image of the thumbnail.
+        """
+        path = self.path / f"{activity['id']}-{thumbnail_hash(activity)}.svg"
+        with self._lock:
+            if path.exists():
+                os.utime(path)  # Mark as most recently used
+                return path.read_bytes()
+
+        svg = render_thumbnail(
+            activity["map"]["summary_polyline"],
+            SPORT_TYPE_COLORS.get(activity["sport_type"], "#FFA800"),
+        ).encode()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # Remove thumbnails of previous versions of the activity
+            added = len(svg)
+            for old_path in self.path.glob(f"{activity['id']}-*.svg"):
+                added -= old_path.stat().st_size
+                old_path.unlink()
+            tmp_path = path.with_suffix(".svg.tmp")
+            tmp_path.write_bytes(svg)
+            os.replace(tmp_path, path)
+            self._evict(added)
+        return svg
+
+    def _evict(self, added: int):
+        # Remove least recently used thumbnails (including thumbnails of
+        # deleted activities) until the cache fits in max_size (the cache
+        # is only listed when it may be too large)
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.path.glob("*.svg"))
+        else:
+            self._size += added
+        if self._size <= self.max_size:
+            return
+        files = sorted(
+            self.path.glob("*.svg"), key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        self._size = 0
+        for file in files:
+            size = file.stat().st_size
+            if self._size + size > self.max_size:
+                file.unlink()
+            else:
+                self._size += size
+
+
+THUMBNAIL_CACHE = ThumbnailCache(DATA_DIR / "thumbnails")
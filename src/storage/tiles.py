@@ -0,0 +1,313 @@
+"""
+This module contains the heatmap tiles of the activities dataset.
+"""
+
+import math
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from storage.store import DATA_DIR, STORE, ActivityStore
+from utils.tracks import decode_polyline
+
+# Size of the tiles (in pixels)
+TILE_SIZE = 256
+
+# Maximum zoom level of the tiles
+MAX_TILE_ZOOM = 18
+
+# Maximum size of the tile cache on disk (in bytes)
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE_MB", "256")) * 1024 * 1024
+
+# Number of passages rendered with the brightest color
+SATURATION = 16
+
+# Colors of the heatmap (from one passage to SATURATION passages)
+LOW_COLOR = np.array([252, 76, 2])
+HIGH_COLOR = np.array([255, 255, 180])
+
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    """
+    Encode an RGBA image (height x width x 4 array of uint8) to PNG.
+    """
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + tag
+            + data
+            + struct.pack(">I", zlib.crc32(tag + data))
+        )
+
+    height, width, _ = rgba.shape
+    # Each scanline starts with its filter type (0: none)
+    raw = np.hstack(
+        [np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)]
+    ).tobytes()
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _project(
+    lat: np.ndarray, lon: np.ndarray, zoom: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Project coordinates to Web Mercator pixel coordinates at a zoom
+    level.
+    """
+    size = TILE_SIZE * 2**zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (lon + 180) / 360 * size
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * size
+    return x, y
+
+
+def _clip(
+    x: np.ndarray, y: np.ndarray, low: float, high: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Clip the segments of a track to a square (Liang-Barsky algorithm).
+    Segments entirely outside of the square are dropped.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Start and
+            end coordinates of the clipped segments.
+    """
+    x0, y0, x1, y1 = x[:-1], y[:-1], x[1:], y[1:]
+    dx, dy = x1 - x0, y1 - y0
+    t0, t1 = np.zeros(dx.size), np.ones(dx.size)
+    keep = np.ones(dx.size, dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for p, q in (
+            (-dx, x0 - low),
+            (dx, high - x0),
+            (-dy, y0 - low),
+            (dy, high - y0),
+        ):
+            keep &= (p != 0) | (q >= 0)  # Parallel to and outside of an edge
+            r = q / p
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+    x0, y0, dx, dy, t0, t1 = (a[keep] for a in (x0, y0, dx, dy, t0, t1))
+    return x0 + t0 * dx, y0 + t0 * dy, x0 + t1 * dx, y0 + t1 * dy
+
+
+def _densify(
+    x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate points along segments (one point per pixel) so that
+    tracks are drawn as continuous lines.
+    """
+    # The end of each segment is the start of the next one (the end of the
+    # track is lost, which is at most one pixel)
+    dx, dy = x1 - x0, y1 - y0
+    steps = np.maximum(np.ceil(np.hypot(dx, dy)), 1).astype(np.int64)
+    segments = np.repeat(np.arange(steps.size), steps)
+    offsets = np.arange(segments.size) - np.repeat(np.cumsum(steps) - steps, steps)
+    fractions = offsets / steps[segments]
+    return x0[segments] + dx[segments] * fractions, y0[segments] + dy[
+        segments
+    ] * fractions
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """
+    Return the bounding box of a tile.
+
+    Args:
+        z (int): Zoom level.
+        x (int): Tile column.
+        y (int): Tile row.
+
+    Returns:
+        tuple[float, float, float, float]: Minimum latitude, minimum
+            longitude, maximum latitude and maximum longitude.
+    """
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+
+def render_tile(polyline_strs: list, z: int, x: int, y: int) -> bytes:
+    """
+    Render a heatmap tile. Each pixel counts the number of tracks going
+    through it (computed with a 2D histogram).
+
+    Args:
+        polyline_strs (list): Polyline strings of the tracks.
+        z (int): Zoom level.
+        x (int): Tile column.
+        y (int): Tile row.
+
+    Returns:
+        bytes: PNG image of the tile.
+    """
+    xs, ys = [np.empty(0)], [np.empty(0)]
+    for polyline_str in polyline_strs:
+        track = decode_polyline(polyline_str)
+        # Pixel coordinates relative to the tile
+        px, py = _project(track.lat, track.lon, z)
+        px, py = px - x * TILE_SIZE, py - y * TILE_SIZE
+        if px.size == 1:
+            xs.append(px)
+            ys.append(py)
+            continue
+        # Only densify the parts of the track inside the tile (with a one
+        # pixel margin) so that the cost does not depend on the track length
+        px, py = _densify(*_clip(px, py, -1, TILE_SIZE + 1))
+        xs.append(px)
+        ys.append(py)
+    counts, _, _ = np.histogram2d(
+        np.concatenate(ys),
+        np.concatenate(xs),
+        bins=TILE_SIZE,
+        range=[[0, TILE_SIZE], [0, TILE_SIZE]],
+    )
+
+    intensity = np.minimum(np.log1p(counts) / np.log1p(SATURATION), 1)[..., None]
+    rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    rgba[..., :3] = LOW_COLOR + (HIGH_COLOR - LOW_COLOR) * intensity
+    rgba[..., 3] = np.where(counts > 0, 128 + 127 * intensity[..., 0], 0)
+    return _encode_png(rgba)
+
+
+class TileCache:
+    """
+    Disk-backed LRU cache of the heatmap tiles of an activity store.
+
+    Args:
+        path (Path): Directory containing the cached tiles.
+        store (ActivityStore, optional): Activity store. Defaults to
+            STORE.
+        max_size (int, optional): Maximum size of the cache (in bytes).
+            Defaults to TILE_CACHE_SIZE.
+    """
+
+    def __init__(
+        self, path: Path, store: ActivityStore = STORE, max_size: int = TILE_CACHE_SIZE
+    ):
+        self.path = path
+        self.store = store
+        self.max_size = max_size
+        self._size = None  # Size of the cached tiles (computed on first write)
+        self._lock = threading.Lock()
+
+    def _path(self, z: int, x: int, y: int) -> Path:
+        return self.path / str(z) / str(x) / f"{y}.png"
+
+    def get(self, z: int, x: int, y: int) -> bytes:
+        """
+        Return a heatmap tile of the latest dataset, rendering it on
+        cache miss.
+
+        Args:
+            z (int): Zoom level.
+            x (int): Tile column.
+            y (int): Tile row.
+
+        Returns:
+            bytes: PNG image of the tile.
+        """
+        path = self._path(z, x, y)
+        with self._lock:
+            if path.exists():
+                os.utime(path)  # Mark as most recently used
+                return path.read_bytes()
+
+        dataset = self.store.snapshot()
+        rows = dataset.spatial_index.query(*tile_bounds(z, x, y))
+        png = render_tile(
+            dataset.df[rows]
+            .get_column("map")
+            .struct.field("summary_polyline")
+            .to_list(),
+            z,
+            x,
+            y,
+        )
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            # The store changed during the rendering: the tile may be stale
+            # and missed by invalidate() so it is not cached
+            if self.store.version != dataset.version:
+                return png
+            tmp_path = path.with_suffix(".png.tmp")
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, path)
+            self._evict(len(png))
+        return png
+
+    def _evict(self, added: int):
+        # Remove least recently used tiles until the cache fits in max_size
+        # (the cache is only listed when it may be too large)
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.path.glob("*/*/*.png"))
+        else:
+            self._size += added
+        if self._size <= self.max_size:
+            return
+        files = sorted(
+            self.path.glob("*/*/*.png"), key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        self._size = 0
+        for file in files:
+            size = file.stat().st_size
+            if self._size + size > self.max_size:
+                file.unlink()
+            else:
+                self._size += size
+
+    def invalidate(self, changed: pl.DataFrame):
+        """
+        Remove the cached tiles touched by changed activities.
+
+        Args:
+            changed (pl.DataFrame): Activities added, edited or deleted.
+        """
+        bboxes = [
+            (track.lat.max(), track.lon.min(), track.lat.min(), track.lon.max())
+            for track in map(
+                decode_polyline,
+                changed.get_column("map").struct.field("summary_polyline"),
+            )
+            if len(track) > 0
+        ]
+        if not bboxes:
+            return
+        bboxes = np.array(bboxes)
+        with self._lock:
+            # Only visit cached tiles (most tiles are never requested)
+            for z_path in self.path.glob("*"):
+                # Top left and bottom right tiles of each bounding box
+                xs, ys = _project(
+                    bboxes[:, [0, 2]], bboxes[:, [1, 3]], int(z_path.name)
+                )
+                xs, ys = xs // TILE_SIZE, ys // TILE_SIZE
+                for path in z_path.glob("*/*.png"):
+                    x, y = int(path.parent.name), int(path.stem)
+                    if np.any(
+                        (xs[:, 0] <= x)
+                        & (x <= xs[:, 1])
+                        & (ys[:, 0] <= y)
+                        & (y <= ys[:, 1])
+                    ):
+                        path.unlink()
+
+
+TILE_CACHE = TileCache(DATA_DIR / "tiles")
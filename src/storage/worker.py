@@ -0,0 +1,115 @@
+"""
+This module contains the background synchronisation worker.
+"""
+
+import datetime
+import os
+import threading
+import time
+
+from storage.sync import _add_interval, load_history, sync_activities, sync_athlete
+
+# Delay between two synchronisations (in seconds)
+SYNC_INTERVAL = int(os.getenv("SYNC_INTERVAL", "900"))
+
+# Delay between two loadings of requested history (in seconds), doubled after
+# each failure (up to SYNC_INTERVAL) so that rate limits are respected
+HISTORY_INTERVAL = int(os.getenv("HISTORY_INTERVAL", "60"))
+
+_HISTORY_LOCK = threading.Lock()
+_HISTORY_EVENT = threading.Event()
+_history_requests = []  # Time intervals to load (sorted list of [start, stop])
+
+
+def request_history(start: datetime.datetime, stop: datetime.datetime):
+    """
+    Queue a time interval for loading by the worker. The activities are
+    loaded in the background (a bounded number of pages at a time) and
+    published as new dataset versions.
+
+    Args:
+        start (datetime.datetime): Start of the interval (UTC).
+        stop (datetime.datetime): End of the interval (UTC).
+    """
+    global _history_requests  # pylint: disable=global-statement
+    if start >= stop:
+        return
+    with _HISTORY_LOCK:
+        requests = _add_interval(_history_requests, start, stop)
+        if requests == _history_requests:
+            return
+        _history_requests = requests
+    _HISTORY_EVENT.set()
+
+
+def _next_history_request() -> list | None:
+    with _HISTORY_LOCK:
+        return list(_history_requests[0]) if _history_requests else None
+
+
+def _complete_history_request(interval: list):
+    with _HISTORY_LOCK:
+        if interval in _history_requests:
+            _history_requests.remove(interval)
+
+
+class SyncWorker(threading.Thread):
+    """
+    Background thread synchronising the local stores with Strava on a
+    schedule and loading the history requested by the pages.
+
+    Args:
+        interval (int, optional): Delay between two synchronisations (in
+            seconds). Defaults to SYNC_INTERVAL.
+    """
+
+    def __init__(self, interval: int = SYNC_INTERVAL):
+        super().__init__(name="sync-worker", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_sync = time.monotonic()
+        history_delay = HISTORY_INTERVAL
+        while not self._stop_event.is_set():
+            if time.monotonic() >= next_sync:
+                self._sync()
+                next_sync = time.monotonic() + self.interval
+            timeout = next_sync - time.monotonic()
+
+            interval = _next_history_request()
+            if interval is not None:
+                try:
+                    changed = load_history(*interval)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    print(f"History loading failed: {e}")
+                    history_delay = min(2 * history_delay, self.interval)
+                    # Back off even if new history is requested meanwhile
+                    self._stop_event.wait(min(timeout, history_delay))
+                    continue
+                history_delay = HISTORY_INTERVAL
+                if changed is None:
+                    # Interval fully loaded (without requesting Strava)
+                    _complete_history_request(interval)
+                    continue
+                timeout = min(timeout, history_delay)
+
+            _HISTORY_EVENT.wait(max(timeout, 0))
+            _HISTORY_EVENT.clear()
+
+    def _sync(self):
+        try:
+            sync_athlete()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Athlete synchronisation failed: {e}")
+        try:
+            sync_activities()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Activities synchronisation failed: {e}")
+
+    def stop(self):
+        """
+        Stop the worker after the current synchronisation.
+        """
+        self._stop_event.set()
+        _HISTORY_EVENT.set()
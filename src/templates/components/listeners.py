@@ -0,0 +1,49 @@
+# pylint: disable=invalid-name, redefined-builtin
+# Disable invalid name to match dash PascalCase
+# Disable redefined builtin for id parameter
+"""
+This module contains template event listener components.
+"""
+
+from dash_extensions import EventListener
+
+# Clientside callback returning the current time when a ScrollListener is
+# scrolled near its bottom (no update otherwise)
+NEAR_BOTTOM = """
+(event) => {
+    if (!event || event["target.scrollHeight"] - event["target.scrollTop"]
+            - event["target.clientHeight"] > 200) {
+        return window.dash_clientside.no_update;
+    }
+    return Date.now();
+}
+"""
+
+
+def ScrollListener(id: str | dict, children):
+    """
+    Create a component listening to the scroll events of its scrollable
+    children.
+
+    Args:
+        id (str | dict): Component ID.
+        children (Component): Scrollable component(s).
+
+    Returns:
+        EventListener: Scroll listener component.
+    """
+    return EventListener(
+        children,
+        id=id,
+        events=[
+            {
+                "event": "scroll",
+                "props": [
+                    "target.scrollTop",
+                    "target.scrollHeight",
+                    "target.clientHeight",
+                ],
+            }
+        ],
+        useCapture=True,  # Scroll events do not bubble
+    )
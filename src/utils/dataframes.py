@@ -6,6 +6,8 @@ import datetime
 
 import polars as pl
 
+from constants.colors import MONTH_COLORS
+from storage.rollups import Rollups
 from utils.dates import monday_of_week
 
 
@@ -57,49 +59,51 @@ def create_iso_week_df(
 
 
 def create_weekly_df(
-    df: pl.DataFrame,
+    rollups: Rollups,
     sport_types: list,
     start_date: datetime.date,
     stop_date: datetime.date,
 ) -> pl.DataFrame:
     """
-    Create a weekly dataframe from the activities dataframe.
+    Create a weekly dataframe from the activities rollups.
+
+    Full weeks are read from the weekly rollup and the partial weeks at
+    the edges of the date range from the daily rollup, so the cost does
+    not depend on the number of activities.
 
     Args:
-        df (pl.DataFrame): Activities dataframe.
+        rollups (Rollups): Activities rollups.
         sport_types (list): List of sport types to keep.
         start_date (datetime.date): Start date.
-        stop_date (datetime.date): Stop date.
+        stop_date (datetime.date): Stop date (excluded).
 
     Returns:
-        pl.DataFrame: Weekly dataframe.
+        pl.DataFrame: Weekly dataframe sorted by week.
     """
-    # Create dataframe from data
-    df = (
-        df.select(
-            [
-                "type",
-                "sport_type",
-                "start_date_local",
-                "distance",
-                "elapsed_time",
-                "total_elevation_gain",
-            ]
-        )
-        .with_columns(
-            pl.col("start_date_local").str.to_datetime("%Y-%m-%dT%H:%M:%S+00:00")
-        )
-        .filter(
-            (pl.col("sport_type").is_in(sport_types))
-            & (pl.col("start_date_local").is_between(start_date, stop_date))
-        )
+    # Full weeks start between the first Monday after start_date (included)
+    # and the Monday of the week of stop_date (excluded)
+    full_weeks = pl.col("date").is_between(
+        monday_of_week(start_date + datetime.timedelta(days=6)),
+        monday_of_week(stop_date),
+        closed="left",
     )
+    sport_types_filter = pl.col("sport_type").is_in(sport_types)
 
     # Aggregate distances by week and sport type
     weekly_df = (
-        df.with_columns(
-            pl.col("start_date_local").dt.iso_year().alias("iso_year"),
-            pl.col("start_date_local").dt.week().alias("iso_week"),
+        pl.concat(
+            [
+                rollups.weekly.filter(sport_types_filter & full_weeks),
+                rollups.daily.filter(
+                    sport_types_filter
+                    & pl.col("date").is_between(start_date, stop_date, closed="left")
+                    & ~full_weeks
+                ),
+            ]
+        )
+        .with_columns(
+            pl.col("date").dt.iso_year().alias("iso_year"),
+            pl.col("date").dt.week().alias("iso_week"),
         )
         .group_by(["iso_year", "iso_week", "type", "sport_type"])
         .agg(
@@ -121,10 +125,108 @@ def create_weekly_df(
     full_index = iso_week_df.join(sports_df, how="cross")
 
     # Merge with weekly_df to fill missing weeks/sport types with 0 distance
-    return full_index.join(
-        weekly_df, on=["iso_year", "iso_week", "type", "sport_type"], how="left"
-    ).with_columns(
-        pl.col("distance").fill_null(0),
-        pl.col("elapsed_time").fill_null(0),
-        pl.col("total_elevation_gain").fill_null(0),
+    return (
+        full_index.join(
+            weekly_df, on=["iso_year", "iso_week", "type", "sport_type"], how="left"
+        )
+        .with_columns(
+            pl.col("distance").fill_null(0),
+            pl.col("elapsed_time").fill_null(0),
+            pl.col("total_elevation_gain").fill_null(0),
+        )
+        .sort(["iso_year", "iso_week", "type", "sport_type"])
+    )
+
+
+def create_calendar_df(
+    df: pl.DataFrame,
+    weekly_rollup: pl.DataFrame,
+    sport_types: list,
+    start_date: datetime.date | None = None,
+    stop_date: datetime.date | None = None,
+) -> pl.DataFrame:
+    """
+    Create a calendar dataframe (one row per week, newest first) from
+    the activities dataframe.
+
+    Args:
+        df (pl.DataFrame): Activities dataframe.
+        weekly_rollup (pl.DataFrame): Weekly rollup of the activities.
+        sport_types (list): List of sport types to keep.
+        start_date (datetime.date | None, optional): First day of the
+            calendar (extended to the Monday of its week). Defaults to
+            None (first activity).
+        stop_date (datetime.date | None, optional): Last day of the
+            calendar (extended to the Sunday of its week). Defaults to
+            None (last activity).
+
+    Returns:
+        pl.DataFrame: Calendar dataframe with the Monday and ISO week of
+            each week, the list of activities and background color of
+            each weekday and the weekly running, cycling and total
+            distances (null for weeks without activity).
+    """
+    df = df.filter(pl.col("sport_type").is_in(sport_types))
+    # Only keep whole weeks so that weekly distances match the activities
+    if start_date is not None:
+        df = df.filter(
+            pl.col("start_date_local").dt.date() >= monday_of_week(start_date)
+        )
+    if stop_date is not None:
+        df = df.filter(
+            pl.col("start_date_local").dt.date()
+            < monday_of_week(stop_date) + datetime.timedelta(weeks=1)
+        )
+    if df.is_empty():
+        return pl.DataFrame()
+
+    # Activities of each day
+    daily_df = df.group_by(pl.col("start_date_local").dt.date().alias("date")).agg(
+        pl.struct("id", "sport_type", "distance")
+        .sort_by(pl.col("start_date_local"))
+        .alias("activities")
+    )
+
+    # Distances of each week
+    weekly_df = (
+        weekly_rollup.filter(pl.col("sport_type").is_in(sport_types))
+        .group_by(pl.col("date").alias("monday"))
+        .agg(
+            (pl.col("distance").filter(pl.col("type") == "Run").sum() / 1000).alias(
+                "running_distance"
+            ),
+            (pl.col("distance").filter(pl.col("type") == "Ride").sum() / 1000).alias(
+                "cycling_distance"
+            ),
+            (pl.col("distance").sum() / 1000).alias("total_distance"),
+        )
+    )
+
+    # Grid of (week, weekday)
+    return (
+        pl.date_range(
+            monday_of_week(
+                start_date or df.get_column("start_date_local").min().date()
+            ),
+            monday_of_week(stop_date or df.get_column("start_date_local").max().date()),
+            interval="1w",
+            eager=True,
+        )
+        .to_frame("monday")
+        .join(pl.DataFrame({"weekday": range(7)}), how="cross")
+        .with_columns(
+            (pl.col("monday") + pl.duration(days=pl.col("weekday"))).alias("date")
+        )
+        .join(daily_df, on="date", how="left")
+        .with_columns(
+            pl.col("date")
+            .dt.month()
+            .replace_strict(MONTH_COLORS, return_dtype=pl.String)
+            .alias("color")
+        )
+        .sort(["monday", "weekday"], descending=[True, False])
+        .group_by("monday", maintain_order=True)
+        .agg(pl.col("activities"), pl.col("color"))
+        .join(weekly_df, on="monday", how="left", maintain_order="left")
+        .with_columns(pl.col("monday").dt.week().alias("iso_week"))
     )
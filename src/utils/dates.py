@@ -26,3 +26,20 @@ def duration_to_string(seconds: float | int) -> str:
     hours, remainder = divmod(seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def date_range_to_utc(
+    start_date: str, stop_date: str
+) -> tuple[datetime.datetime, datetime.datetime]:
+    """
+    Return the UTC interval containing a range of local dates (date
+    pickers values, stop date included). Local dates can be up to one day
+    away from UTC dates.
+    """
+    start = datetime.datetime.strptime(start_date, "%Y-%m-%d").replace(
+        tzinfo=datetime.timezone.utc
+    ) - datetime.timedelta(days=1)
+    stop = datetime.datetime.strptime(stop_date, "%Y-%m-%d").replace(
+        tzinfo=datetime.timezone.utc
+    ) + datetime.timedelta(days=2)
+    return start, stop
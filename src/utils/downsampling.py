@@ -0,0 +1,47 @@
+"""
+This module contains the utilities for time series downsampling.
+"""
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Downsample a time series with the Largest-Triangle-Three-Buckets
+    algorithm. The first and last points are always kept and one point
+    is selected in each bucket in between: the one forming the largest
+    triangle with the point selected in the previous bucket and the
+    average point of the next bucket.
+
+    Args:
+        x (np.ndarray): X values (sorted).
+        y (np.ndarray): Y values (missing values are treated as zeros).
+        n_out (int): Number of points to keep.
+
+    Returns:
+        np.ndarray: Indices of the selected points.
+    """
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = np.nan_to_num(y.astype(np.float64))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average point of each bucket (the last bucket is the last point)
+    sizes = np.append(np.diff(edges), 1)
+    avg_x = np.add.reduceat(x, np.append(edges[:-1], n - 1)) / sizes
+    avg_y = np.add.reduceat(y, np.append(edges[:-1], n - 1)) / sizes
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (avg_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
@@ -2,11 +2,39 @@
 This module contains the utilities for maps visualisation.
 """
 
-from math import log2
+from math import ceil, log2
 
+import numpy as np
 import plotly.graph_objects as go
 import polars as pl
-import polyline
+
+from utils.tracks import Track, decode_polyline, simplify_polyline
+
+# Maximum zoom level of map tiles
+MAX_ZOOM_LEVEL = 22
+
+# Clientside callback expanding the activity names of grouped tracks (sent
+# once per track in the trace meta) over the points of the tracks
+EXPAND_TRACK_NAMES = """
+(figure) => {
+    if (!figure) {
+        throw window.dash_clientside.PreventUpdate;
+    }
+    const data = figure.data.map((trace) => {
+        if (!trace.meta || !trace.meta.sizes) {
+            return trace;
+        }
+        const customdata = [];
+        trace.meta.names.forEach((name, i) => {
+            for (let j = 0; j < trace.meta.sizes[i]; j++) {
+                customdata.push(name);
+            }
+        });
+        return { ...trace, customdata: customdata };
+    });
+    return { ...figure, data: data };
+}
+"""
 
 
 def compute_map_coords(
@@ -80,36 +108,47 @@ def compute_map_coords(
     }
 
 
+def _compute_zoom(map_coords: dict[str, float]) -> float:
+    lat_range = map_coords["max_lat"] - map_coords["min_lat"]
+    lon_range = map_coords["max_lon"] - map_coords["min_lon"]
+    max_range = max(lat_range, lon_range)
+    return 7.7 - log2(max_range + 1e-6)
+
+
+def _get_track(polyline_str: str | None, level: int | None = None) -> Track:
+    if level is None:
+        return decode_polyline(polyline_str)
+    return simplify_polyline(polyline_str, level)
+
+
 def _create_scattermap(
-    polyline_str: str, name: str = "", color: str = "#FFA800"
+    polyline_str: str | None,
+    name: str = "",
+    color: str = "#FFA800",
+    level: int | None = None,
 ) -> tuple[go.Scattermap, dict[str, float]]:
     """
     Create a Scattermap object from a polyline string and return it
     along with the center coordinates.
 
     Args:
-        polyline_str (str): Polyline string representing the path.
+        polyline_str (str | None): Polyline string representing the path.
         name (str, optional): Name of the trace. Defaults to "".
         color (str, optional): Color of the trace. Defaults to "#FFA800".
+        level (int | None, optional): Zoom level used to simplify the
+            path. Defaults to None (no simplification).
 
     Returns:
         tuple[go.Scattermap, dict[str, float]]: Scattermap object and
             dictionary containting useful coordinates (min, max and
             center latitude and longitude).
     """
-    decoded_polyline = polyline.decode(polyline_str)
-
-    lat = [point[0] for point in decoded_polyline]
-    lon = [point[1] for point in decoded_polyline]
-
-    min_lat, min_lon, max_lat, max_lon = min(lat), min(lon), max(lat), max(lon)
-    center_lat = min_lat + (max_lat - min_lat) / 2
-    center_lon = min_lon + (max_lon - min_lon) / 2
+    track = _get_track(polyline_str, level)
 
     return (
         go.Scattermap(
-            lat=lat,
-            lon=lon,
+            lat=track.lat,
+            lon=track.lon,
             name=name,
             mode="lines",
             marker={
@@ -117,13 +156,54 @@ def _create_scattermap(
                 "color": color,
             },
         ),
-        {
-            "center_lat": center_lat,
-            "center_lon": center_lon,
-            "min_lat": min_lat,
-            "min_lon": min_lon,
-            "max_lat": max_lat,
-            "max_lon": max_lon,
+        track.coords,
+    )
+
+
+def _create_grouped_scattermap(
+    polyline_strs: list,
+    names: list,
+    group_name: str = "",
+    color: str = "#FFA800",
+    level: int | None = None,
+) -> go.Scattermap:
+    """
+    Create a single Scattermap object from several polyline strings.
+    Tracks are separated by gaps. The name and number of points of each
+    track are stored in the trace meta, the figure must be displayed with
+    the EXPAND_TRACK_NAMES clientside callback to show the names on
+    hover.
+
+    Args:
+        polyline_strs (list): Polyline strings representing the paths.
+        names (list): Names of the activities.
+        group_name (str, optional): Name of the trace. Defaults to "".
+        color (str, optional): Color of the trace. Defaults to "#FFA800".
+        level (int | None, optional): Zoom level used to simplify the
+            paths. Defaults to None (no simplification).
+
+    Returns:
+        go.Scattermap: Scattermap object.
+    """
+    tracks = [_get_track(pl_str, level) for pl_str in polyline_strs]
+    gap = np.array([np.nan])
+
+    return go.Scattermap(
+        # Single precision is enough for display (~1 m) and halves the payload
+        lat=np.concatenate([part for t in tracks for part in (t.lat, gap)]).astype(
+            np.float32
+        ),
+        lon=np.concatenate([part for t in tracks for part in (t.lon, gap)]).astype(
+            np.float32
+        ),
+        # Names are sent once per track instead of once per point
+        meta={"names": names, "sizes": [len(t) + 1 for t in tracks]},
+        hovertemplate="%{customdata}<extra>%{fullData.name}</extra>",
+        name=group_name,
+        mode="lines",
+        marker={
+            "size": 5,
+            "color": color,
         },
     )
 
@@ -133,6 +213,9 @@ def create_map(
     name: str | list = None,
     color: str | list = None,
     map_layer: str = "open-street-map",
+    group: list = None,
+    simplify: bool = True,
+    zoom: float | None = None,
 ) -> go.Figure:
     """
     Create a map figure from polyline strings.
@@ -142,6 +225,14 @@ def create_map(
         name (str | list, optional): Name(s) of the trace(s). Defaults to None.
         color (str | list, optional): Color(s) of the trace(s). Defaults to None.
         map_layer (str, optional): Map layer style. Defaults to "open-street-map".
+        group (list, optional): Group of each polyline (e.g.: sport type).
+            Polylines of the same group are drawn as a single trace named
+            after the group and colored with the color of its first
+            polyline. Defaults to None (one trace per polyline).
+        simplify (bool, optional): Simplify the traces to the precision
+            visible at the initial zoom level. Defaults to True.
+        zoom (float | None, optional): Initial zoom level. Defaults to
+            None (computed to fit the traces).
 
     Returns:
         go.Figure: Map Plotly figure object.
@@ -160,26 +251,55 @@ def create_map(
     fig = go.Figure()
 
     # Iterate over polylines
+    indices = []
     center_lats, center_lons = [], []
     min_lats, min_lons, max_lats, max_lons = [], [], [], []
-    for pl_str, n, c in zip(polyline_str, name, color):
-        scattermap, coords = _create_scattermap(pl_str, n, c)
-        fig.add_trace(scattermap)
+    for i, pl_str in enumerate(polyline_str):
+        track = decode_polyline(pl_str)
+        if len(track) == 0:
+            continue  # Skip activities without track (e.g.: indoor activities)
+        indices.append(i)
+        coords = track.coords
         center_lats.append(coords["center_lat"])
         center_lons.append(coords["center_lon"])
         min_lats.append(coords["min_lat"])
         min_lons.append(coords["min_lon"])
         max_lats.append(coords["max_lat"])
         max_lons.append(coords["max_lon"])
+    if not center_lats:
+        return fig.update_layout(
+            margin={"l": 0, "t": 0, "b": 0, "r": 0},
+            map={"style": map_layer},
+        )
     # Remove outliers from coordinates
     map_coords = compute_map_coords(
         center_lats, center_lons, min_lats, min_lons, max_lats, max_lons
     )
     # Compute map zoom
-    lat_range = map_coords["max_lat"] - map_coords["min_lat"]
-    lon_range = map_coords["max_lon"] - map_coords["min_lon"]
-    max_range = max(lat_range, lon_range)
-    zoom = 7.7 - log2(max_range + 1e-6)
+    if zoom is None:
+        zoom = _compute_zoom(map_coords)
+    # Simplify tracks to the precision visible at this zoom level
+    level = None if not simplify else min(max(ceil(zoom), 0), MAX_ZOOM_LEVEL)
+    # Create traces
+    if group is None:
+        for i in indices:
+            fig.add_trace(
+                _create_scattermap(polyline_str[i], name[i], color[i], level)[0]
+            )
+    else:
+        groups = {}
+        for i in indices:
+            groups.setdefault(group[i], []).append(i)
+        for group_name, group_indices in groups.items():
+            fig.add_trace(
+                _create_grouped_scattermap(
+                    [polyline_str[i] for i in group_indices],
+                    [name[i] for i in group_indices],
+                    group_name,
+                    color[group_indices[0]],
+                    level,
+                )
+            )
     # Update figure layout
     fig.update_layout(
         margin={"l": 0, "t": 0, "b": 0, "r": 0},
@@ -193,3 +313,64 @@ def create_map(
         },
     )
     return fig
+
+
+def create_tile_map(
+    tile_url: str,
+    bboxes: np.ndarray,
+    map_layer: str = "open-street-map",
+    max_zoom: int = MAX_ZOOM_LEVEL,
+) -> go.Figure:
+    """
+    Create a map figure displaying a raster tile layer (e.g.: heatmap)
+    above the map layer.
+
+    Args:
+        tile_url (str): URL template of the tiles (with {z}, {x} and {y}
+            placeholders).
+        bboxes (np.ndarray): Bounding boxes of the tracks (min latitude,
+            min longitude, max latitude and max longitude), used to
+            center the map.
+        map_layer (str, optional): Map layer style. Defaults to "open-street-map".
+        max_zoom (int, optional): Maximum zoom level of the tiles.
+            Defaults to MAX_ZOOM_LEVEL.
+
+    Returns:
+        go.Figure: Map Plotly figure object.
+    """
+    fig = go.Figure(go.Scattermap())  # A trace is required to display the map
+    fig.update_layout(
+        margin={"l": 0, "t": 0, "b": 0, "r": 0},
+        map={
+            "style": map_layer,
+            "layers": [
+                {
+                    "sourcetype": "raster",
+                    "source": [tile_url],
+                    "maxzoom": max_zoom,
+                }
+            ],
+        },
+    )
+
+    bboxes = bboxes[~np.isnan(bboxes[:, 0])]
+    if bboxes.size == 0:
+        return fig
+    # Remove outliers from coordinates
+    map_coords = compute_map_coords(
+        list((bboxes[:, 0] + bboxes[:, 2]) / 2),
+        list((bboxes[:, 1] + bboxes[:, 3]) / 2),
+        list(bboxes[:, 0]),
+        list(bboxes[:, 1]),
+        list(bboxes[:, 2]),
+        list(bboxes[:, 3]),
+    )
+    return fig.update_layout(
+        map={
+            "center": {
+                "lon": map_coords["center_lon"],
+                "lat": map_coords["center_lat"],
+            },
+            "zoom": _compute_zoom(map_coords),
+        },
+    )
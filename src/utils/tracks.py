@@ -0,0 +1,165 @@
+"""
+This module contains the utilities for activity tracks.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+# Number of decoded tracks kept in memory
+TRACK_CACHE_SIZE = 4096
+
+
+def _coords(lat: np.ndarray, lon: np.ndarray) -> dict[str, float] | None:
+    """
+    Compute the useful coordinates of a track (min, max and center
+    latitude and longitude).
+    """
+    if lat.size == 0:
+        return None
+    min_lat, max_lat = float(lat.min()), float(lat.max())
+    min_lon, max_lon = float(lon.min()), float(lon.max())
+    return {
+        "center_lat": min_lat + (max_lat - min_lat) / 2,
+        "center_lon": min_lon + (max_lon - min_lon) / 2,
+        "min_lat": min_lat,
+        "min_lon": min_lon,
+        "max_lat": max_lat,
+        "max_lon": max_lon,
+    }
+
+
+@dataclass(frozen=True)
+class Track:
+    """
+    Decoded activity track.
+
+    Args:
+        lat (np.ndarray): Latitudes (read-only).
+        lon (np.ndarray): Longitudes (read-only).
+        coords (dict[str, float] | None): Useful coordinates of the track
+            (min, max and center latitude and longitude, None for empty
+            tracks). Computed once when the track is decoded.
+    """
+
+    lat: np.ndarray
+    lon: np.ndarray
+    coords: dict[str, float] | None = field(default=None, compare=False)
+
+    def __len__(self) -> int:
+        return self.lat.size
+
+
+def _decode(polyline_str: str, precision: int = 5) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decode a polyline string with NumPy (Google encoded polyline
+    algorithm).
+    """
+    chunks = (
+        np.frombuffer(polyline_str.encode("ascii"), dtype=np.uint8).astype(np.int64)
+        - 63
+    )
+    # Each value is made of 5 bits chunks, the last one has no continuation bit
+    ends = np.flatnonzero(chunks < 0x20)
+    ends = ends[: ends.size - ends.size % 2]  # Ignore incomplete points
+    if ends.size == 0:
+        return np.empty(0), np.empty(0)
+    chunks = chunks[: ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = 5 * (
+        np.arange(chunks.size) - np.repeat(starts, ends - starts + 1)
+    )  # Position of each chunk in its value
+    values = np.bitwise_or.reduceat((chunks & 0x1F) << shifts, starts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+    # Values are interleaved latitude and longitude offsets
+    coords = np.cumsum(values.reshape(-1, 2), axis=0) / 10**precision
+    return coords[:, 0], coords[:, 1]
+
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def decode_polyline(polyline_str: str | None) -> Track:
+    """
+    Decode a polyline string into a track. Tracks are cached by polyline
+    string so that each polyline is only decoded once.
+
+    Args:
+        polyline_str (str | None): Polyline string.
+
+    Returns:
+        Track: Decoded track (empty if the polyline is empty).
+    """
+    lat, lon = _decode(polyline_str or "")
+    # Tracks are shared between callers
+    lat.flags.writeable = False
+    lon.flags.writeable = False
+    return Track(lat, lon, _coords(lat, lon))
+
+
+def zoom_tolerance(level: int) -> float:
+    """
+    Return the size of a pixel (in degrees of longitude) at a map zoom
+    level (Plotly maps use 512 pixels wide tiles).
+
+    Args:
+        level (int): Map zoom level.
+
+    Returns:
+        float: Pixel size.
+    """
+    return 360 / (512 * 2**level)
+
+
+def _douglas_peucker(x: np.ndarray, y: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Return the mask of the points kept by the Douglas-Peucker algorithm
+    (distances of each segment are computed at once with NumPy).
+    """
+    keep = np.zeros(x.size, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, x.size - 1)]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+        dx, dy = x[stop] - x[start], y[stop] - y[start]
+        px, py = x[start + 1 : stop] - x[start], y[start + 1 : stop] - y[start]
+        norm = np.hypot(dx, dy)
+        if norm == 0:
+            dist = np.hypot(px, py)
+        else:
+            dist = np.abs(px * dy - py * dx) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            i += start + 1
+            keep[i] = True
+            stack.extend([(start, i), (i, stop)])
+    return keep
+
+
+@lru_cache(maxsize=TRACK_CACHE_SIZE)
+def simplify_polyline(polyline_str: str | None, level: int) -> Track:
+    """
+    Decode and simplify a polyline string so that the simplified track
+    deviates from the original one by less than a pixel at the given map
+    zoom level. Simplified tracks are cached by polyline string and zoom
+    level.
+
+    Args:
+        polyline_str (str | None): Polyline string.
+        level (int): Map zoom level.
+
+    Returns:
+        Track: Simplified track.
+    """
+    track = decode_polyline(polyline_str)
+    if len(track) < 3:
+        return track
+    # Scale longitudes so that both axes have the same pixel size (Web
+    # Mercator projection)
+    scale = np.cos(np.radians(track.lat.mean()))
+    keep = _douglas_peucker(track.lon * scale, track.lat, zoom_tolerance(level) * scale)
+    lat, lon = track.lat[keep], track.lon[keep]
+    lat.flags.writeable = False
+    lon.flags.writeable = False
+    return Track(lat, lon, _coords(lat, lon))
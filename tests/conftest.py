@@ -0,0 +1,43 @@
+"""
+This module contains the configuration of the tests.
+"""
+
+import os
+import tempfile
+
+# The storage and Strava modules are configured from the environment when
+# imported: use dummy credentials and a temporary data directory
+os.environ.setdefault("STRAVA_ACCESS_TOKEN", "test")
+os.environ.setdefault("STRAVA_TOKEN_EXPIRES", "0")
+os.environ.setdefault("STRAVA_REFRESH_TOKEN", "test")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="datamountain-tests-")
+
+# pylint: disable=wrong-import-position
+import pytest  # noqa: E402
+
+from fakes import FakeClient  # noqa: E402
+from storage import sync  # noqa: E402
+from storage.store import ActivityStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    Empty activity store in a temporary directory.
+    """
+    return ActivityStore(tmp_path / "activities")
+
+
+@pytest.fixture
+def strava(monkeypatch):
+    """
+    Replace the Strava client of the synchronisation with a FakeClient
+    serving the given activities.
+    """
+
+    def install(activities: list, descending: bool = False) -> FakeClient:
+        client = FakeClient(activities, descending)
+        monkeypatch.setattr(sync, "CLIENT", client)
+        return client
+
+    return install
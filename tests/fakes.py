@@ -0,0 +1,88 @@
+"""
+This module contains fake Strava objects used by the tests.
+"""
+
+import datetime
+
+
+class FakeActivity:
+    """
+    Fake Strava activity (dumped the same way as stravalib models).
+
+    Args:
+        **fields: Activity fields.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def model_dump(self) -> dict:
+        return dict(self.fields)
+
+
+class FakeClient:
+    """
+    Fake Strava client serving a list of activities. Activities are
+    returned in ascending start date order (or descending order if
+    descending is set) and the after and before bounds are exclusive,
+    like the Strava API.
+
+    Args:
+        activities (list[FakeActivity]): Activities of the athlete.
+        descending (bool, optional): Return activities in descending
+            start date order. Defaults to False.
+    """
+
+    def __init__(self, activities: list, descending: bool = False):
+        self.activities = activities
+        self.descending = descending
+        self.calls = []
+
+    def get_activities(self, after=None, before=None, limit=None) -> list:
+        self.calls.append((after, before, limit))
+        activities = sorted(
+            (
+                activity
+                for activity in self.activities
+                if (after is None or activity.fields["start_date"] > after)
+                and (before is None or activity.fields["start_date"] < before)
+            ),
+            key=lambda activity: activity.fields["start_date"],
+            reverse=self.descending,
+        )
+        return activities[:limit]
+
+
+START = datetime.datetime(2025, 1, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+def day(n: float) -> datetime.datetime:
+    """
+    Return the datetime n days after START.
+    """
+    return START + datetime.timedelta(days=n)
+
+
+def activity(
+    activity_id: int, start_date: datetime.datetime, sport_type: str = "Run", **fields
+) -> FakeActivity:
+    """
+    Create a fake activity (measures are integers so that sums are exact
+    whatever the summation order).
+    """
+    return FakeActivity(
+        **{
+            "id": activity_id,
+            "name": f"Activity {activity_id}",
+            "type": "Ride" if sport_type.endswith("Ride") else sport_type,
+            "sport_type": sport_type,
+            "start_date": start_date,
+            "start_date_local": start_date,
+            "distance": 10000.0,
+            "elapsed_time": 3600,
+            "moving_time": 3600,
+            "total_elevation_gain": 100.0,
+            "map": {"id": f"a{activity_id}", "summary_polyline": ""},
+        }
+        | fields
+    )
@@ -0,0 +1,109 @@
+"""
+This module contains the tests of the rollup tables.
+"""
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+from fakes import activity, day
+from storage.rollups import PERIODS, Rollups
+from storage.store import activities_to_records
+from storage.sync import _merge, load_history
+
+ACTIVITIES = [
+    activity(i, day(3 * i), sport_type)
+    for i, sport_type in enumerate(
+        ["Run", "Ride", "TrailRun", "Run", "GravelRide"] * 12
+    )
+]
+
+
+def sync(store, activities: list):
+    """
+    Merge activities into a store the same way as the synchronisation
+    (the whole store being the fetched window).
+    """
+    _merge(store, activities_to_records(activities), pl.lit(True))
+
+
+def edit(activity_id: int, **fields) -> list:
+    """
+    Return ACTIVITIES with the fields of an activity replaced.
+    """
+    return [
+        activity(activity_id, **(a.fields | fields))
+        if a.fields["id"] == activity_id
+        else a
+        for a in ACTIVITIES
+    ]
+
+
+def assert_rollups_built(store):
+    """
+    Check that the incrementally updated rollups of the latest dataset
+    match rollups computed from scratch.
+    """
+    dataset = store.snapshot()
+    expected = Rollups.build(dataset.df)
+    for period in PERIODS:
+        assert_frame_equal(
+            getattr(dataset.rollups, period).sort("date", "type", "sport_type"),
+            getattr(expected, period).sort("date", "type", "sport_type"),
+        )
+
+
+@pytest.mark.parametrize(
+    "activities",
+    [
+        # Insert activities in new and existing periods
+        ACTIVITIES + [activity(100, day(4)), activity(101, day(400), "Swim")],
+        # Edit the measures of an activity
+        edit(3, distance=5000.0, elapsed_time=1800),
+        # Move an activity to another period
+        edit(3, start_date=day(70), start_date_local=day(70)),
+        # Change the sport type of an activity
+        edit(1, type="Ride", sport_type="MountainBikeRide"),
+        # Delete activities, including the only one of its period
+        ACTIVITIES[1:-1],
+        # Insert, edit and delete at once
+        [activity(100, day(-40), "Hike")]
+        + edit(2, start_date=day(6), start_date_local=day(6), sport_type="Run")[:50],
+    ],
+)
+def test_update_matches_build(store, activities):
+    sync(store, ACTIVITIES)
+    version = store.version
+
+    sync(store, activities)
+
+    assert store.version > version
+    assert_rollups_built(store)
+
+
+def test_update_without_changes(store):
+    sync(store, ACTIVITIES)
+    rollups = store.snapshot().rollups
+
+    sync(store, ACTIVITIES)
+
+    assert store.snapshot().rollups is rollups
+
+
+def test_load_history_updates_rollups(store, strava):
+    strava(ACTIVITIES)
+
+    for start, stop in [(day(30), day(60)), (day(-1), day(40)), (day(50), day(200))]:
+        load_history(start, stop, store, page_size=4, max_pages=2)
+        assert_rollups_built(store)
+
+
+def test_build_totals(store):
+    sync(store, ACTIVITIES)
+    rollups = store.snapshot().rollups
+
+    for period in PERIODS:
+        df = getattr(rollups, period)
+        assert df["count"].sum() == len(ACTIVITIES)
+        assert df["distance"].sum() == 10000 * len(ACTIVITIES)
+        assert df["elapsed_time"].sum() == 3600 * len(ACTIVITIES)
@@ -0,0 +1,240 @@
+"""
+This module contains the tests of the synchronisation.
+"""
+
+import polars as pl
+import pytest
+
+from fakes import activity, day
+from storage.store import activities_to_records
+from storage.sync import (
+    _add_interval,
+    _merge,
+    _missing_intervals,
+    _read_coverage,
+    _read_state,
+    _write_state,
+    load_history,
+)
+
+# One activity a day during 45 days
+ACTIVITIES = [activity(i, day(i)) for i in range(45)]
+
+
+def ids(store) -> list:
+    return sorted(store.dataframe["id"].to_list())
+
+
+def coverage(store) -> list:
+    return _read_coverage(_read_state(store), store)
+
+
+def test_add_interval_to_empty_coverage():
+    assert _add_interval([], day(0), day(10)) == [[day(0), day(10)]]
+
+
+def test_add_disjoint_intervals():
+    coverage = _add_interval([[day(20), day(30)]], day(0), day(10))
+
+    assert coverage == [[day(0), day(10)], [day(20), day(30)]]
+
+
+def test_add_overlapping_interval():
+    coverage = _add_interval([[day(0), day(10)], [day(20), day(30)]], day(5), day(25))
+
+    assert coverage == [[day(0), day(30)]]
+
+
+def test_add_adjacent_interval():
+    assert _add_interval([[day(0), day(10)]], day(10), day(20)) == [[day(0), day(20)]]
+
+
+def test_add_contained_interval():
+    coverage = [[day(0), day(30)]]
+
+    assert _add_interval(coverage, day(5), day(10)) == [[day(0), day(30)]]
+
+
+def test_add_interval_does_not_modify_coverage():
+    coverage = [[day(0), day(10)]]
+    _add_interval(coverage, day(5), day(20))
+
+    assert coverage == [[day(0), day(10)]]
+
+
+def test_missing_intervals_without_coverage():
+    assert _missing_intervals([], day(0), day(10)) == [[day(0), day(10)]]
+
+
+def test_missing_intervals_covered():
+    assert _missing_intervals([[day(0), day(30)]], day(5), day(10)) == []
+    assert _missing_intervals([[day(0), day(30)]], day(0), day(30)) == []
+
+
+def test_missing_intervals_gaps():
+    coverage = [[day(10), day(20)], [day(30), day(40)]]
+
+    assert _missing_intervals(coverage, day(0), day(50)) == [
+        [day(0), day(10)],
+        [day(20), day(30)],
+        [day(40), day(50)],
+    ]
+
+
+def test_missing_intervals_partial_overlap():
+    coverage = [[day(10), day(20)]]
+
+    assert _missing_intervals(coverage, day(15), day(25)) == [[day(20), day(25)]]
+    assert _missing_intervals(coverage, day(5), day(15)) == [[day(5), day(10)]]
+
+
+def test_missing_intervals_outside_coverage():
+    coverage = [[day(10), day(20)]]
+
+    assert _missing_intervals(coverage, day(0), day(5)) == [[day(0), day(5)]]
+    assert _missing_intervals(coverage, day(25), day(30)) == [[day(25), day(30)]]
+
+
+def test_missing_intervals_filled_by_added_interval():
+    coverage = _add_interval([[day(10), day(20)]], day(20), day(30))
+
+    assert _missing_intervals(coverage, day(0), day(40)) == [
+        [day(0), day(10)],
+        [day(30), day(40)],
+    ]
+
+
+def test_add_empty_or_inverted_interval():
+    assert _add_interval([[day(0), day(10)]], day(20), day(20)) == [[day(0), day(10)]]
+    assert _add_interval([[day(0), day(10)]], day(30), day(20)) == [[day(0), day(10)]]
+
+
+def test_missing_intervals_empty_or_inverted():
+    assert _missing_intervals([], day(10), day(10)) == []
+    assert _missing_intervals([[day(0), day(5)]], day(10), day(0)) == []
+
+
+def test_read_coverage_drops_inverted_intervals(store):
+    _write_state(
+        store,
+        {
+            "coverage": [
+                [day(10).isoformat(), day(5).isoformat()],
+                [day(20).isoformat(), day(30).isoformat()],
+                [day(0).isoformat(), day(25).isoformat()],
+            ]
+        },
+    )
+
+    assert coverage(store) == [[day(0), day(30)]]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_load_history(store, strava, descending):
+    client = strava(ACTIVITIES, descending)
+
+    changed = load_history(day(-1), day(50), store, page_size=10)
+
+    assert changed.height == 45
+    assert ids(store) == list(range(45))
+    assert coverage(store) == [[day(-1), day(50)]]
+    assert len(client.calls) == 5  # 4 full pages and a partial one
+
+
+@pytest.mark.parametrize(
+    "descending, covered",
+    [(False, [[day(-1), day(19)]]), (True, [[day(25), day(50)]])],
+)
+def test_load_history_max_pages(store, strava, descending, covered):
+    client = strava(ACTIVITIES, descending)
+
+    load_history(day(-1), day(50), store, page_size=10, max_pages=2)
+
+    assert store.dataframe.height == 20
+    assert coverage(store) == covered
+
+    # The next calls continue with the rest of the interval
+    while load_history(day(-1), day(50), store, page_size=10, max_pages=2) is not None:
+        pass
+
+    assert ids(store) == list(range(45))
+    assert coverage(store) == [[day(-1), day(50)]]
+    # Each activity is requested once (plus the empty last pages)
+    assert sum(limit for *_, limit in client.calls) < 45 + 2 * 10
+
+
+def test_load_history_covered_interval(store, strava):
+    client = strava(ACTIVITIES)
+    load_history(day(-1), day(50), store)
+    client.calls.clear()
+
+    assert load_history(day(10), day(20), store) is None
+    assert not client.calls
+
+
+@pytest.mark.parametrize("start, stop", [(day(20), day(10)), (day(10), day(10))])
+def test_load_history_empty_or_inverted_interval(store, strava, start, stop):
+    client = strava(ACTIVITIES)
+
+    assert load_history(start, stop, store) is None
+    assert not client.calls
+    assert coverage(store) == []
+
+
+def test_load_history_overlapping_intervals(store, strava):
+    client = strava(ACTIVITIES)
+    load_history(day(-1), day(20.5), store)
+    client.calls.clear()
+
+    load_history(day(10.5), day(50), store)
+
+    assert ids(store) == list(range(45))
+    assert [(after, before) for after, before, _ in client.calls] == [
+        (day(20.5), day(50))
+    ]
+
+
+def test_merge_edits_and_deletions(store, strava):
+    strava(ACTIVITIES)
+    load_history(day(-1), day(50), store)
+
+    # Activity 3 is renamed, activities 5 (in the window) and 30 (out of
+    # the window) are deleted
+    fetched = [
+        activity(3, day(3), name="Renamed") if a.fields["id"] == 3 else a
+        for a in ACTIVITIES[:20]
+        if a.fields["id"] != 5
+    ]
+    changed = _merge(
+        store,
+        activities_to_records(fetched),
+        pl.col("start_date").is_between(day(-1), day(19.5)),
+    )
+
+    assert sorted(changed["id"].to_list()) == [3, 3, 5]
+    assert ids(store) == [i for i in range(45) if i != 5]
+    assert store.snapshot().activity(3)["name"] == "Renamed"
+
+
+def test_merge_without_changes(store, strava):
+    strava(ACTIVITIES)
+    load_history(day(-1), day(50), store)
+    version = store.version
+
+    changed = _merge(
+        store, activities_to_records(ACTIVITIES), pl.col("start_date") > day(-1)
+    )
+
+    assert changed.is_empty()
+    assert store.version == version
+
+
+def test_merge_duplicate_records(store):
+    records = activities_to_records(
+        [activity(1, day(1)), activity(1, day(1), name="Renamed"), activity(2, day(2))]
+    )
+
+    _merge(store, records, pl.lit(True))
+
+    assert ids(store) == [1, 2]
+    assert store.snapshot().activity(1)["name"] == "Renamed"
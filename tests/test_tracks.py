@@ -0,0 +1,62 @@
+"""
+This module contains the tests of the activity tracks utilities.
+"""
+
+import pytest
+
+from utils.tracks import decode_polyline, simplify_polyline
+
+
+@pytest.mark.parametrize(
+    "polyline_str, points",
+    [
+        # Example of the Google encoded polyline algorithm documentation
+        (
+            "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
+            [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)],
+        ),
+        ("??", [(0.0, 0.0)]),
+        ("b_vmEaa|y[", [(-33.86882, 151.20929)]),
+        (
+            "b_vmEaa|y[@AA@",
+            [(-33.86882, 151.20929), (-33.86883, 151.2093), (-33.86882, 151.20929)],
+        ),
+        ("}bidP|fsia@zfsia@{ngtcA", [(89.99999, -179.99999), (-89.99999, 179.99999)]),
+        # Incomplete points are ignored
+        ("_p~iF~ps|U_ulL", [(38.5, -120.2)]),
+    ],
+)
+def test_decode_polyline(polyline_str, points):
+    track = decode_polyline(polyline_str)
+    lats, lons = zip(*points)
+
+    assert track.lat.tolist() == pytest.approx(lats, abs=1e-9)
+    assert track.lon.tolist() == pytest.approx(lons, abs=1e-9)
+    assert track.coords["min_lat"] == pytest.approx(min(lats))
+    assert track.coords["max_lat"] == pytest.approx(max(lats))
+    assert track.coords["min_lon"] == pytest.approx(min(lons))
+    assert track.coords["max_lon"] == pytest.approx(max(lons))
+
+
+@pytest.mark.parametrize("polyline_str", [None, ""])
+def test_decode_empty_polyline(polyline_str):
+    track = decode_polyline(polyline_str)
+
+    assert len(track) == 0
+    assert track.coords is None
+
+
+def test_decoded_tracks_are_read_only():
+    track = decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+    with pytest.raises(ValueError):
+        track.lat[0] = 0
+
+
+def test_simplify_polyline_keeps_ends():
+    # Nearly aligned points are merged, the ends are always kept
+    track = simplify_polyline("b_vmEaa|y[@AA@", 5)
+
+    assert track.lat.tolist() == pytest.approx([-33.86882, -33.86882], abs=1e-9)
+    assert track.lon.tolist() == pytest.approx([151.20929, 151.20929], abs=1e-9)
+    assert track.coords == decode_polyline("b_vmEaa|y[").coords